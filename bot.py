@@ -2,25 +2,93 @@
 Main entry point for the Telegram bot.
 """
 
+import asyncio
 import os
 from dotenv import load_dotenv
 from telegram.ext import Application, CommandHandler, ContextTypes, CallbackQueryHandler, MessageHandler, filters
 
+# Load environment variables before importing modules that read their configuration from it
+load_dotenv()
+
 # Import from other modules
 from state import *
 from handlers import start, handle_callback, handle_address, add_address, remove_address, list_addresses, home
-from monitoring import subscribe_new_tokens, subscribe_trader_activity, subscribe_vybe_trades
+from monitoring import subscribe_new_tokens, subscribe_trader_activity, subscribe_vybe_trades, resume_subscriptions, shutdown_monitoring
 from websocket_handlers import on_message, on_error, on_close, on_open
+from send_queue import STOP_GRACE, send_queue
+from digest import digest_buffer
+from storage import state_store
+from metadata import metadata_fetcher
+from recorder import frame_recorder
+from metrics import metrics_server
+from logs import setup_logging, shutdown_logging
+from webhook import WEBHOOK_URL, run_webhook
+from update_processor import update_processor
+from shards import SHARD_ROLE, shard_router
+from shard_worker import run_worker
 
-# Load environment variables
-load_dotenv()
+async def post_init(application: Application):
+    # Start the outbound alert queue once the bot is initialized
+    send_queue.start(application.bot)
+    # Persist watchlist changes in the background and pick up where we left off
+    state_store.start()
+    if SHARD_ROLE == 'ingress':
+        # Workers receive every user's state when they connect and resume from it
+        await shard_router.start()
+    else:
+        resume_subscriptions(application)
+    await metrics_server.start()
+
+async def post_stop(application: Application):
+    # Stop monitoring, close the open digest windows and send what is queued while the bot can still send
+    await shutdown_monitoring()
+    digest_buffer.flush_all()
+    await send_queue.drain(STOP_GRACE)
+    await send_queue.stop()
+
+async def post_shutdown(application: Application):
+    await metrics_server.stop()
+    if SHARD_ROLE == 'ingress':
+        await shard_router.stop()
+    await state_store.stop()
+    await metadata_fetcher.close()
+    frame_recorder.close()
+    shutdown_logging()
 
 def main():
+    setup_logging()
+
+    if SHARD_ROLE == 'worker':
+        # Spawned by the ingress: monitor this shard's users, no update stream
+        asyncio.run(run_worker())
+        shutdown_logging()
+        return
+
     bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
     if not bot_token:
         raise ValueError("Please set the TELEGRAM_BOT_TOKEN environment variable")
 
-    application = Application.builder().token(bot_token).build()
+    # Restore every user's watchlists and monitoring flags from the previous run
+    state_store.open()
+    state_store.load()
+
+    builder = (
+        Application.builder()
+        .token(bot_token)
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+        # Different users in parallel, each user's updates in order
+        .concurrent_updates(update_processor)
+    )
+    # Point the bot at a different Bot API server (a local Bot API server or loadtest.py)
+    api_url = os.getenv('TELEGRAM_API_URL')
+    if api_url:
+        builder = builder.base_url(api_url)
+    if WEBHOOK_URL:
+        # Updates arrive on our own webhook server instead of the getUpdates poller
+        builder = builder.updater(None)
+    application = builder.build()
     
     # Add command handlers
     application.add_handler(CommandHandler("start", start))
@@ -33,7 +101,10 @@ def main():
     application.add_handler(CommandHandler("remove_address", remove_address))
     application.add_handler(CommandHandler("list_addresses", list_addresses))
 
-    application.run_polling()
+    if WEBHOOK_URL:
+        asyncio.run(run_webhook(application))
+    else:
+        application.run_polling()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""
+Small in-process caches shared by the monitoring modules.
+"""
+
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """
+    Bounded mapping with LRU eviction and a per-entry time-to-live.
+
+    Expired entries are dropped lazily when read and by ``expire()``, which
+    only walks entries from the oldest end so a sweep stays cheap.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # Map of key → (expires_at, value), ordered from least to most recently used
+        self.data = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        entry = self.data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self.data[key]
+            return default
+        self.data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        self.data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        entry = self.data.pop(key, None)
+        if entry is None or entry[0] <= time.monotonic():
+            return default
+        return entry[1]
+
+    def expire(self):
+        """
+        Drop expired entries from the least recently used end, stopping at the first live one.
+        """
+        now = time.monotonic()
+        while self.data:
+            key, (expires_at, _) = next(iter(self.data.items()))
+            if expires_at > now:
+                break
+            del self.data[key]
+
+_MISSING = object()
@@ -0,0 +1,55 @@
+"""
+Per-user deduplication of trade alerts by transaction signature.
+
+A trade can match several of a user's filters at once (all trades of a
+trader, a trader-token pair, a dev-trade track), so it is checked here before
+it is formatted and queued for sending.
+"""
+
+import os
+
+from cache import TTLCache
+
+# Seconds a signature is remembered for each user
+DEDUP_WINDOW = float(os.getenv('DEDUP_WINDOW', '600'))
+# Maximum number of signatures remembered for each user
+DEDUP_MAX_PER_USER = int(os.getenv('DEDUP_MAX_PER_USER', '1000'))
+
+class SignatureDeduper:
+    """
+    Time-windowed LRU of recently delivered signatures, one bounded cache per user.
+    """
+
+    def __init__(self, window: float = DEDUP_WINDOW, max_per_user: int = DEDUP_MAX_PER_USER):
+        self.window = window
+        self.max_per_user = max_per_user
+        # Map of user_id → TTLCache of signatures already delivered to that user
+        self.seen = {}
+        self.duplicates = 0
+
+    def is_duplicate(self, user_id: int, signature: str) -> bool:
+        """
+        Return True if ``signature`` was already delivered to the user.
+        """
+        signatures = self.seen.get(user_id)
+        if not signature or signatures is None or signature not in signatures:
+            return False
+        self.duplicates += 1
+        return True
+
+    def record(self, user_id: int, signature: str):
+        """
+        Remember that ``signature`` was delivered to the user.
+        """
+        if not signature:
+            return
+        signatures = self.seen.get(user_id)
+        if signatures is None:
+            signatures = self.seen[user_id] = TTLCache(self.max_per_user, self.window)
+        signatures.set(signature, True)
+
+    def forget_user(self, user_id: int):
+        self.seen.pop(user_id, None)
+
+# Process-wide deduper shared by every alert path
+trade_deduper = SignatureDeduper()
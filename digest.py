@@ -0,0 +1,117 @@
+"""
+Digest mode: batches a watchlist entry's trades into one summary message per time window.
+"""
+
+import asyncio
+
+from render import SOLSCAN_TX_URL, VYBE_TOKEN_URL, VYBE_WALLET_URL, escape, is_token_buy, is_trader_buy
+from send_queue import send_queue
+
+# Maximum number of transaction links listed in one digest
+MAX_DIGEST_LINKS = 20
+
+class DigestEntry:
+    """
+    Running totals for one (user, fee payer, token) bucket within the current window.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self.buys = 0
+        self.sells = 0
+        self.base_total = 0.0
+        self.quote_total = 0.0
+        self.signatures = []
+        self.extra_signatures = 0
+
+    def add(self, trade_data: dict, is_buy: bool):
+        if is_buy:
+            self.buys += 1
+        else:
+            self.sells += 1
+        self.base_total += float(trade_data.get('baseSize') or 0)
+        self.quote_total += float(trade_data.get('quoteSize') or 0)
+        signature = trade_data.get('signature')
+        if signature:
+            if len(self.signatures) < MAX_DIGEST_LINKS:
+                self.signatures.append(signature)
+            else:
+                self.extra_signatures += 1
+
+def format_window(seconds: float) -> str:
+    if seconds >= 60 and seconds % 60 == 0:
+        return f"{int(seconds // 60)} min"
+    return f"{int(seconds)} sec"
+
+def format_digest(fee_payer: str, token_mint: str, entry: DigestEntry) -> str:
+    window = format_window(entry.window)
+    net = entry.buys - entry.sells
+    fee_payer = escape(fee_payer)
+    formatted_message = (
+        f"🗞 <b>Trade Digest</b> (last {window})\n\n"
+        f"<b>Trader:</b><a href='{VYBE_WALLET_URL}{fee_payer}'> {fee_payer}\n</a>"
+    )
+    if token_mint:
+        token_mint = escape(token_mint)
+        formatted_message += f"<b>Token:</b><a href='{VYBE_TOKEN_URL}{token_mint}'> {token_mint}\n</a>"
+    formatted_message += (
+        f"\n<b>Trades:</b> {entry.buys + entry.sells} (🟢 {entry.buys} buys / 🔴 {entry.sells} sells, net {net:+d})\n"
+        f"<b>Total Base Amount:</b> {entry.base_total:.6f}\n"
+        f"<b>Total Quote Amount:</b> {entry.quote_total:.6f}\n"
+    )
+    if entry.signatures:
+        links = " | ".join(
+            f"<a href='{SOLSCAN_TX_URL}{escape(signature)}'>{index}</a>"
+            for index, signature in enumerate(entry.signatures, start=1)
+        )
+        formatted_message += f"\n<b>Transactions:</b> {links}"
+        if entry.extra_signatures:
+            formatted_message += f" (+{entry.extra_signatures} more)"
+    return formatted_message
+
+class DigestBuffer:
+    """
+    Collects trades per (user_id, fee_payer, token_mint) and sends one summary when the window closes.
+    """
+
+    def __init__(self):
+        # Map of (user_id, fee_payer, token_mint or None) → DigestEntry for the open window
+        self.pending = {}
+        # Map of bucket → TimerHandle that closes its window
+        self.timers = {}
+
+    def add(self, user_id: int, key: tuple, trade_data: dict, window: float):
+        fee_payer, token_mint = key
+        bucket = (user_id, fee_payer, token_mint)
+        entry = self.pending.get(bucket)
+        if entry is None:
+            entry = self.pending[bucket] = DigestEntry(window)
+            self.timers[bucket] = asyncio.get_running_loop().call_later(window, self.flush, bucket)
+
+        is_buy = is_token_buy(trade_data, token_mint) if token_mint else is_trader_buy(trade_data)
+        entry.add(trade_data, is_buy)
+
+    def flush(self, bucket: tuple):
+        timer = self.timers.pop(bucket, None)
+        if timer:
+            timer.cancel()
+        entry = self.pending.pop(bucket, None)
+        if entry is None:
+            return
+        user_id, fee_payer, token_mint = bucket
+        send_queue.send_message(
+            user_id,
+            text=format_digest(fee_payer, token_mint, entry),
+            parse_mode='HTML',
+            disable_web_page_preview=True
+        )
+
+    def flush_all(self):
+        """
+        Close every open window now, e.g. at shutdown before the send queue is drained.
+        """
+        for bucket in list(self.pending):
+            self.flush(bucket)
+
+# Process-wide digest buffer
+digest_buffer = DigestBuffer()
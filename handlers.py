@@ -2,13 +2,18 @@
 Command and callback handlers for the Telegram bot.
 """
 
-import asyncio
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
 # Import from other modules
-from state import user_watchlists, active_monitoring, trader_watchlists, active_trader_monitoring, pending_vybe_tracks, dev_trade_watchlists, trader_token_watchlists
-from monitoring import subscribe_new_tokens, subscribe_trader_activity, subscribe_vybe_trades, subscribe_trader_token_activity
+from state import user_watchlists, active_monitoring, trader_watchlists, active_trader_monitoring, pending_vybe_tracks, dev_trade_watchlists, trader_token_watchlists, notify_change, track_id_age, digest_users, digest_entries, digest_windows, snapshot
+from shards import lookup_pending_track
+from digest import format_window
+from logs import get_logger
+from monitoring import (start_dev_monitoring, stop_dev_monitoring, start_trader_monitoring, stop_trader_monitoring,
+                        start_trader_token)
+
+logger = get_logger('handlers')
 
 def get_monitoring_buttons(user_id: int) -> list:
     dev_button = InlineKeyboardButton(
@@ -41,6 +46,53 @@ def get_home_page_markup(user_id: int) -> InlineKeyboardMarkup:
     ]
     return InlineKeyboardMarkup(keyboard)
 
+# Digest window choices offered in the digest settings keyboard, in seconds
+DIGEST_WINDOW_CHOICES = (30, 60, 300)
+# Token characters kept in a digest entry button's callback_data ("digest_entry:<address>:<prefix>" ≤ 64 bytes)
+DIGEST_TOKEN_PREFIX = 6
+
+def get_digest_text(user_id: int) -> str:
+    window_label = format_window(snapshot(user_id).digest_window)
+    return (
+        "🗞 Digest Mode\n\n"
+        "Instead of one message per trade, trades are collected and sent as one summary "
+        f"every {window_label} with net buys/sells, total amounts and transaction links.\n\n"
+        "Turn it on for all entries or pick individual traders/devs below."
+    )
+
+def get_digest_markup(user_id: int) -> InlineKeyboardMarkup:
+    """
+    Digest settings keyboard: global toggle, window choice and per-entry toggles
+    """
+    snap = snapshot(user_id)
+    keyboard = [
+        [InlineKeyboardButton(
+            f"{'✅' if snap.digest_all else '⬜'} All Entries",
+            callback_data="digest_all"
+        )],
+        [
+            InlineKeyboardButton(
+                f"{'• ' if snap.digest_window == seconds else ''}{format_window(seconds)}",
+                callback_data=f"digest_window:{seconds}"
+            )
+            for seconds in DIGEST_WINDOW_CHOICES
+        ]
+    ]
+
+    for key in sorted(snap.entry_keys(), key=lambda entry: (entry[0], entry[1] or '')):
+        address, token = key
+        label = f"{address[:6]}…{address[-4:]}"
+        if token:
+            label += f" → {token[:4]}…{token[-4:]}"
+        keyboard.append([InlineKeyboardButton(
+            f"{'✅' if key in snap.digest_entries else '⬜'} {label}",
+            # callback_data is capped at 64 bytes, so the token is identified by its prefix
+            callback_data=f"digest_entry:{address}:{(token or '')[:DIGEST_TOKEN_PREFIX]}"
+        )])
+
+    keyboard.append([InlineKeyboardButton("🏠 Back to Home", callback_data="start")])
+    return InlineKeyboardMarkup(keyboard)
+
 async def show_home_page(update: Update, context: ContextTypes.DEFAULT_TYPE, is_query=False):
     """
     Displays the standardized home page
@@ -81,7 +133,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
-    await query.answer()
+    # Track buttons answer below, with an alert when the button has expired
+    if not query.data.startswith("track_dev_vybe:"):
+        await query.answer()
     user_id = update.effective_user.id
     
     if query.data == "dev_tracking":
@@ -150,11 +204,44 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         keyboard = [
             [InlineKeyboardButton("❌ Remove Address", callback_data="remove_address")],
             [InlineKeyboardButton("❌ Remove Trader-Token Pair", callback_data="remove_trader_token")],
+            [InlineKeyboardButton("🗞 Digest Mode", callback_data="digest_menu")],
             [InlineKeyboardButton("🏠 Back to Home", callback_data="start")]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         await query.message.reply_text(message, reply_markup=reply_markup, parse_mode='HTML')
     
+    elif query.data == "digest_menu":
+        await query.message.reply_text(get_digest_text(user_id), reply_markup=get_digest_markup(user_id))
+
+    elif query.data == "digest_all" or query.data.startswith("digest_window:") or query.data.startswith("digest_entry:"):
+        if query.data == "digest_all":
+            if user_id in digest_users:
+                digest_users.discard(user_id)
+            else:
+                digest_users.add(user_id)
+        elif query.data.startswith("digest_window:"):
+            seconds = int(query.data.split(':', 1)[1])
+            if seconds in DIGEST_WINDOW_CHOICES:
+                digest_windows[user_id] = seconds
+        else:
+            _, address, *prefix = query.data.split(':')
+            prefix = prefix[0] if prefix else ''
+            for key in snapshot(user_id).entry_keys():
+                if key[0] == address and (key[1] or '')[:DIGEST_TOKEN_PREFIX] == prefix:
+                    entries = digest_entries.setdefault(user_id, set())
+                    if key in entries:
+                        entries.discard(key)
+                    else:
+                        entries.add(key)
+                    break
+        notify_change(user_id)
+
+        try:
+            await query.message.edit_text(get_digest_text(user_id), reply_markup=get_digest_markup(user_id))
+        except Exception as e:
+            # Telegram rejects edits that don't change anything (e.g. re-selecting the same window)
+            logger.debug("Could not refresh digest settings: %s", e)
+
     elif query.data == "start":
         await show_home_page(update, context, is_query=True)
     
@@ -210,11 +297,14 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         if user_id in active_monitoring:  
             active_monitoring.discard(user_id)
+            notify_change(user_id)
+            stop_dev_monitoring(user_id)
             await query.message.reply_text("❌ Developer monitoring stopped.")
         else:  
             active_monitoring.add(user_id)
+            notify_change(user_id)
+            start_dev_monitoring(user_id, context)
             await query.message.reply_text("✅ Developer monitoring started!")
-            asyncio.create_task(subscribe_new_tokens(user_id, context))
         
         # Update the home page buttons to reflect new state
         reply_markup = get_home_page_markup(user_id)
@@ -230,35 +320,40 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         if user_id in active_trader_monitoring:  
             active_trader_monitoring.discard(user_id)
+            notify_change(user_id)
+            stop_trader_monitoring(user_id)
             await query.message.reply_text("❌ Trader monitoring stopped.")
         else:  
             active_trader_monitoring.add(user_id)
+            notify_change(user_id)
+            # Starts the all-trades task and one task per trader-token pair (no-op for any already running)
+            start_trader_monitoring(user_id, context)
             await query.message.reply_text("✅ Trader monitoring started!")
-            
-            # Start monitoring for general traders
-            if has_traders:
-                asyncio.create_task(subscribe_trader_activity(user_id, context))
-            
-            # Start monitoring for trader-token pairs
-            if has_trader_tokens:
-                for trader, token in trader_token_watchlists[user_id].items():
-                    asyncio.create_task(subscribe_trader_token_activity(user_id, trader, token, context))
         
         # Update the home page buttons to reflect new state
         reply_markup = get_home_page_markup(user_id)
         await query.message.edit_reply_markup(reply_markup=reply_markup)
 
     elif query.data.startswith("track_dev_vybe:"):
-        track_id = query.data.split(':')[1]
-        lookup_key = f"{user_id}:{track_id}"
-        track_info = pending_vybe_tracks.pop(lookup_key, None) # Retrieve and remove
+        track_id = query.data.split(':', 1)[1]
+        # Shared by every recipient, so not removed; held by the user's worker when sharded
+        try:
+            track_info = await lookup_pending_track(user_id, track_id)
+        except Exception:
+            # Answer anyway so the client doesn't spin until the callback times out
+            await query.answer("❌ Couldn't look up this alert's tracking info. Please try again.", show_alert=True)
+            raise
 
         if track_info:
+            await query.answer()
             token_mint = track_info['mint']
             fee_payer = track_info['dev'] # Get dev address stored as fee_payer
 
             try:
-                print(f"Initiating Vybe tracking via button for token: {token_mint} and fee payer: {fee_payer}")
+                logger.info("Initiating Vybe tracking via button for token %s and fee payer %s", token_mint, fee_payer)
+                # Every tracked pair runs while dev monitoring is active (possibly in a shard worker)
+                already_tracking = (user_id in active_monitoring and
+                                    (fee_payer, token_mint) in dev_trade_watchlists.get(user_id, ()))
                 # Decide which monitoring set to use. Using active_monitoring for now.
                 # If you want separate control, create a new set e.g., active_vybe_monitoring.
                 active_monitoring.add(user_id)
@@ -266,28 +361,33 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 # Add fee_payer to the dev_trade_watchlist
                 if user_id not in dev_trade_watchlists:
                     dev_trade_watchlists[user_id] = set()
-                dev_trade_watchlists[user_id].add(fee_payer)
-
-                # Notify user
-                await query.message.reply_text( # Send reply instead of editing original photo caption
-                    f"✅ Starting Vybe monitoring for:\nToken: `{token_mint}`\nFee Payer (Dev): `{fee_payer}`",
-                    parse_mode='Markdown'
-                )
+                dev_trade_watchlists[user_id].add((fee_payer, token_mint))
+                notify_change(user_id)
 
-                # Start the Vybe monitoring task
-                asyncio.create_task(subscribe_vybe_trades(user_id, token_mint, fee_payer, context))
+                # Start the launch stream if dev monitoring was off, plus this pair's Vybe task
+                # (no-op for whatever is already running), as a sharded worker would
+                start_dev_monitoring(user_id, context)
+                if not already_tracking:
+                    message = f"✅ Starting Vybe monitoring for:\nToken: `{token_mint}`\nFee Payer (Dev): `{fee_payer}`"
+                else:
+                    message = f"ℹ️ Already monitoring:\nToken: `{token_mint}`\nFee Payer (Dev): `{fee_payer}`"
+                await query.message.reply_text(message, parse_mode='Markdown') # Send reply instead of editing original photo caption
 
             except Exception as e:
                  await query.message.reply_text(f"❌ Error starting Vybe monitoring: {e}")
 
         else:
-            # Info expired or was invalid
-            await query.answer("Tracking info not found or expired.", show_alert=True)
+            age = track_id_age(track_id)
+            if age is None or age >= pending_vybe_tracks.ttl:
+                message = "⌛ This alert's Track Dev button has expired. Use a newer alert or add the dev from Dev Tracking."
+            else:
+                message = "⚠️ Tracking info for this alert is no longer available (it was evicted or the bot restarted). Use a newer alert."
+            await query.answer(message, show_alert=True)
             # Optionally remove the button from the original message if possible/desired
             try:
                 await query.edit_message_reply_markup(reply_markup=None)
             except Exception as edit_error:
-                print(f"Could not remove button after expiry: {edit_error}")
+                logger.debug("Could not remove button after expiry: %s", edit_error)
 
 async def handle_address(update: Update, context: ContextTypes.DEFAULT_TYPE):
     expecting_dev = context.user_data.get('expecting_address', False)
@@ -309,6 +409,7 @@ async def handle_address(update: Update, context: ContextTypes.DEFAULT_TYPE):
             user_watchlists[user_id] = set()
         
         user_watchlists[user_id].add(address)
+        notify_change(user_id)
         
         keyboard = [
             [
@@ -345,6 +446,7 @@ async def handle_address(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 watchlist_type = "trader watchlist" if not removed_from_dev else "dev and trader watchlists"
                 
             message = f"✅ Address {address} has been removed from your {watchlist_type}!"
+            notify_change(user_id)
         else:
             message = "❌ Address not found in your watchlists!"
         
@@ -359,10 +461,10 @@ async def handle_address(update: Update, context: ContextTypes.DEFAULT_TYPE):
             trader_watchlists[user_id] = set()
         
         trader_watchlists[user_id].add(address)
+        # A running subscribe_trader_activity task picks the new address up from this notification
+        notify_change(user_id)
         
-        # If trader monitoring is already active, start monitoring this new address immediately
         if user_id in active_trader_monitoring:
-            asyncio.create_task(subscribe_trader_activity(user_id, context, specific_trader=address))
             monitoring_status = "✅ Trader address added and monitoring started automatically!"
         else:
             monitoring_status = "✅ Trader address added to your trader watchlist!"
@@ -412,12 +514,14 @@ async def handle_address(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if user_id not in trader_token_watchlists:
             trader_token_watchlists[user_id] = {}
         
-        # Store the trader-token pair
+        # Store the trader-token pair (replacing any previous token for this trader)
         trader_token_watchlists[user_id][trader_address] = token_address
+        notify_change(user_id)
         
         # If trader monitoring is already active, start monitoring this new trader-token pair immediately
         if user_id in active_trader_monitoring:
-            asyncio.create_task(subscribe_trader_token_activity(user_id, trader_address, token_address, context))
+            # Idempotent; a different previous token for this trader is retired
+            start_trader_token(user_id, trader_address, token_address, context)
             monitoring_status = "✅ Trader-token pair added and monitoring started automatically!"
         else:
             monitoring_status = "✅ Trader-token pair added to your watchlist!"
@@ -446,6 +550,7 @@ async def handle_address(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if user_id in trader_token_watchlists and trader_address in trader_token_watchlists[user_id]:
             token = trader_token_watchlists[user_id][trader_address]
             del trader_token_watchlists[user_id][trader_address]
+            notify_change(user_id)
             message = f"✅ Trader-Token pair removed!\nTrader: `{trader_address}`\nToken: `{token}`"
         else:
             message = "❌ Trader address not found in your Trader-Token watchlist!"
@@ -467,6 +572,7 @@ async def add_address(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_watchlists[user_id] = set()
     
     user_watchlists[user_id].add(address)
+    notify_change(user_id)
     await update.message.reply_text(f"Address {address} added to your watchlist")
 
 async def remove_address(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -478,6 +584,7 @@ async def remove_address(update: Update, context: ContextTypes.DEFAULT_TYPE):
     address = context.args[0]
     if user_id in user_watchlists and address in user_watchlists[user_id]:
         user_watchlists[user_id].remove(address)
+        notify_change(user_id)
         await update.message.reply_text(f"Address {address} removed from your watchlist")
     else:
         await update.message.reply_text("Address not found in your watchlist")
@@ -0,0 +1,646 @@
+"""
+Local stand-ins for Vybe, PumpPortal and the Telegram Bot API for end-to-end load tests.
+
+Usage:
+    python loadtest.py --users 10000 --addresses-per-user 50 --seed-db loadtest.db --run-bot --duration 120
+
+Starts three servers in one process:
+
+- a Vybe-compatible WebSocket server that accepts ``configure`` messages with
+  ``filters.trades`` and streams synthetic trades matching each connection's filters,
+- a PumpPortal-compatible WebSocket server that streams ``subscribeNewToken`` launches
+  (plus an HTTP metadata endpoint for their ``uri``),
+- a Telegram Bot API endpoint (``getMe``, ``getUpdates``, ``setWebhook``, ``sendMessage``,
+  ``sendPhoto``, ...) that counts deliveries and measures latency from trade emission to send.
+  With ``--click-rate`` it also "presses" the Track Dev buttons it was sent, delivering the
+  callback queries by webhook (if the bot registered one) or getUpdates, and measures the
+  time until the bot answers them.
+
+Event rates, the address distribution, periodic disconnects, slow-consumer
+drops and Telegram latency/429s are all configurable. With ``--seed-db`` the
+SQLite store is pre-populated with synthetic users, and ``--run-bot`` starts
+bot.py against the fake endpoints (``--shard-workers N`` runs it sharded). ``--min-msg-rate`` makes the run exit
+non-zero when the measured delivery rate falls below it, for CI.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import time
+import aiohttp
+import websockets
+from aiohttp import web
+from collections import deque
+
+from cache import TTLCache
+from render import SOL_MINT
+from storage import SCHEMA
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+SIGNATURE_PATTERN = re.compile(r"solscan\.io/tx/([1-9A-HJ-NP-Za-km-z]+)")
+# Frames buffered per client before it is dropped as a slow consumer
+DEFAULT_MAX_PENDING = 10000
+
+def random_address(rng: random.Random, length: int = 44) -> str:
+    return "".join(rng.choice(BASE58_ALPHABET) for _ in range(length))
+
+class AddressPool:
+    """
+    Deterministic set of trader/dev/token addresses shared by the seeder and the fake servers.
+    """
+
+    def __init__(self, seed: int, traders: int, devs: int, tokens: int, distribution: str = 'zipf', zipf_s: float = 1.1):
+        rng = random.Random(seed)
+        self.traders = [random_address(rng) for _ in range(traders)]
+        self.devs = [random_address(rng) for _ in range(devs)]
+        self.tokens = [random_address(rng) for _ in range(tokens)]
+        self.distribution = distribution
+        # Zipf weights make a few addresses hot and most of them cold, like real traffic
+        self.trader_weights = self._weights(traders, zipf_s)
+        self.dev_weights = self._weights(devs, zipf_s)
+
+    def _weights(self, count: int, zipf_s: float):
+        if self.distribution != 'zipf' or not count:
+            return None
+        return list(itertools.accumulate(1 / (rank ** zipf_s) for rank in range(1, count + 1)))
+
+    def pick_trader(self, rng: random.Random) -> str:
+        return rng.choices(self.traders, cum_weights=self.trader_weights)[0]
+
+    def pick_dev(self, rng: random.Random) -> str:
+        return rng.choices(self.devs, cum_weights=self.dev_weights)[0]
+
+def seed_database(path: str, pool: AddressPool, users: int, addresses_per_user: int,
+                  devs_per_user: int, tokens_per_user: int, seed: int):
+    """
+    Write ``users`` synthetic users with active monitoring into the bot's SQLite store.
+    """
+    rng = random.Random(seed + 1)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    with conn:
+        conn.execute("DELETE FROM watchlist_entries")
+        conn.execute("DELETE FROM active_flags")
+        conn.execute("DELETE FROM user_settings")
+        for user_id in range(1, users + 1):
+            entries = [(user_id, 'trader', address, None)
+                       for address in rng.sample(pool.traders, min(addresses_per_user, len(pool.traders)))]
+            entries += [(user_id, 'dev', address, None)
+                        for address in rng.sample(pool.devs, min(devs_per_user, len(pool.devs)))]
+            entries += [(user_id, 'trader_token', rng.choice(pool.traders), rng.choice(pool.tokens))
+                        for _ in range(tokens_per_user)]
+            conn.executemany("INSERT OR REPLACE INTO watchlist_entries (user_id, kind, address, token) VALUES (?, ?, ?, ?)", entries)
+            flags = [(user_id, 'trader')] + ([(user_id, 'dev')] if devs_per_user else [])
+            conn.executemany("INSERT INTO active_flags (user_id, kind) VALUES (?, ?)", flags)
+    conn.close()
+    print(f"Seeded {users} users ({addresses_per_user} traders, {devs_per_user} devs, "
+          f"{tokens_per_user} trader-token pairs each) into {path}")
+
+class Stats:
+    """
+    Counters and latency samples shared by the fake servers.
+    """
+
+    def __init__(self):
+        self.trades = 0
+        self.frames = 0
+        self.launches = 0
+        self.messages = 0
+        self.photos = 0
+        self.throttled = 0
+        self.disconnects = 0
+        self.slow_consumers = 0
+        # Map of signature → time the fake upstream emitted it
+        self.emitted = TTLCache(1_000_000, 300)
+        self.latencies = []
+        self.clicks = 0
+        self.click_latencies = []
+
+    def ack(self, text: str):
+        match = SIGNATURE_PATTERN.search(text or "")
+        if match:
+            emitted_at = self.emitted.get(match.group(1))
+            if emitted_at is not None:
+                self.latencies.append(time.monotonic() - emitted_at)
+
+class FakeClient:
+    """
+    One connected WebSocket client with a bounded outbound queue.
+    """
+
+    def __init__(self, websocket, max_pending: int):
+        self.websocket = websocket
+        self.outbox = asyncio.Queue(maxsize=max_pending)
+        self.closed = False
+
+    def push(self, frame: str, stats: Stats) -> bool:
+        if self.closed:
+            return False
+        try:
+            self.outbox.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            # Real upstreams drop clients that can't keep up rather than buffer forever
+            stats.slow_consumers += 1
+            self.closed = True
+            asyncio.create_task(self.websocket.close(1008, "slow consumer"))
+            return False
+
+    async def write(self):
+        try:
+            while True:
+                await self.websocket.send(await self.outbox.get())
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+class RateEmitter:
+    """
+    Calls ``emit`` ``rate`` times per second in small ticks.
+    """
+
+    TICK = 0.01
+
+    def __init__(self, rate: float, emit):
+        self.rate = rate
+        self.emit = emit
+
+    async def run(self):
+        owed = 0.0
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(self.TICK)
+            now = time.monotonic()
+            owed += (now - last) * self.rate
+            last = now
+            count = int(owed)
+            owed -= count
+            for _ in range(count):
+                self.emit()
+
+class FakeVybeServer:
+    """
+    Speaks the Vybe ``configure``/``filters.trades`` protocol and streams matching synthetic trades.
+    """
+
+    def __init__(self, pool: AddressPool, stats: Stats, rate: float, disconnect_interval: float,
+                 max_pending: int, seed: int):
+        self.pool = pool
+        self.stats = stats
+        self.rate = rate
+        self.disconnect_interval = disconnect_interval
+        self.max_pending = max_pending
+        self.rng = random.Random(seed + 2)
+        self.clients = set()
+        # Map of fee payer → {client: set of token mints (None = all trades)}
+        self.index = {}
+
+    def configure(self, client: FakeClient, filters: list):
+        self.unindex(client)
+        for trade_filter in filters:
+            fee_payer = trade_filter.get('feePayer')
+            if fee_payer:
+                self.index.setdefault(fee_payer, {}).setdefault(client, set()).add(trade_filter.get('tokenMintAddress'))
+
+    def unindex(self, client: FakeClient):
+        for fee_payer in [fee_payer for fee_payer, clients in self.index.items() if client in clients]:
+            del self.index[fee_payer][client]
+            if not self.index[fee_payer]:
+                del self.index[fee_payer]
+
+    async def handler(self, websocket):
+        client = FakeClient(websocket, self.max_pending)
+        self.clients.add(client)
+        writer = asyncio.create_task(client.write())
+        try:
+            async for message in websocket:
+                try:
+                    data = json.loads(message)
+                except ValueError:
+                    continue
+                if isinstance(data, dict) and data.get('type') == 'configure':
+                    self.configure(client, data.get('filters', {}).get('trades', []))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            writer.cancel()
+            self.clients.discard(client)
+            self.unindex(client)
+
+    def emit_trade(self):
+        rng = self.rng
+        fee_payer = self.pool.pick_trader(rng)
+        token = rng.choice(self.pool.tokens)
+        is_buy = rng.random() < 0.5
+        signature = random_address(rng, 88)
+        trade = {
+            "feePayer": fee_payer,
+            "signature": signature,
+            "blockTime": int(time.time()),
+            "baseMintAddress": SOL_MINT if is_buy else token,
+            "quoteMintAddress": token if is_buy else SOL_MINT,
+            "price": str(rng.uniform(1, 1000)),
+            "baseSize": str(rng.uniform(0.01, 10)),
+            "quoteSize": str(rng.uniform(1, 100000)),
+            "marketId": random_address(rng),
+        }
+        self.stats.trades += 1
+
+        clients = self.index.get(fee_payer)
+        if not clients:
+            return
+        frame = None
+        for client, mints in list(clients.items()):
+            if None in mints or token in mints:
+                if frame is None:
+                    frame = json.dumps(trade)
+                    self.stats.emitted.set(signature, time.monotonic())
+                if client.push(frame, self.stats):
+                    self.stats.frames += 1
+
+    async def disconnect_loop(self):
+        while True:
+            await asyncio.sleep(self.disconnect_interval)
+            if self.clients:
+                client = self.rng.choice(list(self.clients))
+                self.stats.disconnects += 1
+                await client.websocket.close(1011, "simulated upstream restart")
+
+    def tasks(self):
+        tasks = [asyncio.create_task(RateEmitter(self.rate, self.emit_trade).run())]
+        if self.disconnect_interval:
+            tasks.append(asyncio.create_task(self.disconnect_loop()))
+        return tasks
+
+class FakePumpPortalServer:
+    """
+    Speaks the PumpPortal ``subscribeNewToken`` protocol and streams synthetic launches.
+    """
+
+    def __init__(self, pool: AddressPool, stats: Stats, rate: float, disconnect_interval: float,
+                 max_pending: int, metadata_base: str, seed: int):
+        self.pool = pool
+        self.stats = stats
+        self.rate = rate
+        self.disconnect_interval = disconnect_interval
+        self.max_pending = max_pending
+        self.metadata_base = metadata_base
+        self.rng = random.Random(seed + 3)
+        self.subscribers = set()
+
+    async def handler(self, websocket):
+        client = FakeClient(websocket, self.max_pending)
+        writer = asyncio.create_task(client.write())
+        try:
+            async for message in websocket:
+                try:
+                    data = json.loads(message)
+                except ValueError:
+                    continue
+                if isinstance(data, dict) and data.get('method') == 'subscribeNewToken':
+                    self.subscribers.add(client)
+                    client.push(json.dumps({"message": "Successfully subscribed to token creation events."}), self.stats)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            writer.cancel()
+            self.subscribers.discard(client)
+
+    def emit_launch(self):
+        rng = self.rng
+        mint = random_address(rng)
+        signature = random_address(rng, 88)
+        symbol = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(4))
+        launch = {
+            "signature": signature,
+            "mint": mint,
+            "traderPublicKey": self.pool.pick_dev(rng),
+            "txType": "create",
+            "initialBuy": rng.uniform(1e6, 1e8),
+            "solAmount": round(rng.uniform(0.1, 5), 4),
+            "marketCapSol": rng.uniform(20, 60),
+            "name": f"Load Test {symbol}",
+            "symbol": symbol,
+            "uri": f"{self.metadata_base}/metadata/{mint}",
+            "pool": "pump",
+        }
+        self.stats.launches += 1
+        if not self.subscribers:
+            return
+        frame = json.dumps(launch)
+        self.stats.emitted.set(signature, time.monotonic())
+        for client in list(self.subscribers):
+            if client.push(frame, self.stats):
+                self.stats.frames += 1
+
+    async def disconnect_loop(self):
+        while True:
+            await asyncio.sleep(self.disconnect_interval)
+            for client in list(self.subscribers):
+                self.stats.disconnects += 1
+                await client.websocket.close(1011, "simulated upstream restart")
+
+    def tasks(self):
+        tasks = [asyncio.create_task(RateEmitter(self.rate, self.emit_launch).run())]
+        if self.disconnect_interval:
+            tasks.append(asyncio.create_task(self.disconnect_loop()))
+        return tasks
+
+class FakeTelegramServer:
+    """
+    Minimal Telegram Bot API: enough for Application.builder().base_url(...) polling and alert sends.
+    """
+
+    def __init__(self, stats: Stats, latency: float, throttle_fraction: float, click_rate: float, seed: int):
+        self.stats = stats
+        self.latency = latency
+        self.throttle_fraction = throttle_fraction
+        self.click_rate = click_rate
+        self.rng = random.Random(seed + 4)
+        self.message_ids = itertools.count(1)
+        self.update_ids = itertools.count(1)
+        # (url, secret_token) once the bot calls setWebhook
+        self.webhook = None
+        self.session = None
+        # Updates waiting for getUpdates, and an event set when one is added
+        self.updates = deque()
+        self.updates_ready = asyncio.Event()
+        # Inline buttons seen in sent messages: (chat_id, message_id, callback_data)
+        self.buttons = deque(maxlen=10000)
+        # Map of callback query id → time it was delivered to the bot
+        self.pending_clicks = TTLCache(100000, 300)
+
+    def routes(self, app: web.Application):
+        app.router.add_route('*', '/bot{token}/{method}', self.handle_method)
+        app.router.add_get('/metadata/{mint}', self.handle_metadata)
+
+    def _message(self, chat_id, **fields) -> dict:
+        return {
+            "message_id": next(self.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private"},
+            **fields,
+        }
+
+    async def handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        params = dict(await request.post()) if request.can_read_body else {}
+        if request.content_type == 'application/json':
+            params = await request.json()
+
+        if method == 'getMe':
+            return web.json_response({"ok": True, "result": {
+                "id": 1, "is_bot": True, "first_name": "LoadTest", "username": "loadtest_bot",
+                "can_join_groups": False, "can_read_all_group_messages": False, "supports_inline_queries": False,
+            }})
+        if method == 'getUpdates':
+            return web.json_response({"ok": True, "result": await self.get_updates(params)})
+        if method == 'setWebhook':
+            self.webhook = (params.get('url'), params.get('secret_token'))
+            print(f"Bot registered webhook {self.webhook[0]}")
+            return web.json_response({"ok": True, "result": True})
+        if method == 'deleteWebhook':
+            self.webhook = None
+            return web.json_response({"ok": True, "result": True})
+        if method == 'answerCallbackQuery':
+            clicked_at = self.pending_clicks.pop(params.get('callback_query_id'))
+            if clicked_at is not None:
+                self.stats.click_latencies.append(time.monotonic() - clicked_at)
+            return web.json_response({"ok": True, "result": True})
+        if method in ('sendMessage', 'sendPhoto'):
+            if self.throttle_fraction and self.rng.random() < self.throttle_fraction:
+                self.stats.throttled += 1
+                return web.json_response({"ok": False, "error_code": 429,
+                                          "description": "Too Many Requests: retry after 1",
+                                          "parameters": {"retry_after": 1}}, status=429)
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            chat_id = params.get('chat_id', 0)
+            if method == 'sendMessage':
+                self.stats.messages += 1
+                self.stats.ack(params.get('text'))
+                result = self._message(chat_id, text=params.get('text', ''))
+            else:
+                self.stats.photos += 1
+                self.stats.ack(params.get('caption'))
+                file_id = f"loadtest-{abs(hash(params.get('photo')))}"
+                self.remember_buttons(chat_id, params.get('reply_markup'))
+                result = self._message(chat_id, caption=params.get('caption', ''), photo=[
+                    {"file_id": file_id, "file_unique_id": file_id, "width": 150, "height": 150}
+                ])
+            return web.json_response({"ok": True, "result": result})
+        # setMyCommands, editMessageReplyMarkup, ...
+        return web.json_response({"ok": True, "result": True})
+
+    async def get_updates(self, params: dict) -> list:
+        offset = int(params.get('offset') or 0)
+        while self.updates and self.updates[0]['update_id'] < offset:
+            self.updates.popleft()
+        if not self.updates:
+            # Long poll until a click is queued or the timeout expires
+            self.updates_ready.clear()
+            try:
+                await asyncio.wait_for(self.updates_ready.wait(), timeout=min(float(params.get('timeout') or 0), 10))
+            except asyncio.TimeoutError:
+                pass
+        return list(self.updates)[:100]
+
+    def remember_buttons(self, chat_id, reply_markup):
+        if not reply_markup:
+            return
+        markup = json.loads(reply_markup) if isinstance(reply_markup, str) else reply_markup
+        for row in markup.get('inline_keyboard', []):
+            for button in row:
+                if button.get('callback_data'):
+                    self.buttons.append((int(chat_id), next(self.message_ids), button['callback_data']))
+
+    def click(self):
+        if not self.buttons:
+            return
+        chat_id, message_id, callback_data = self.buttons.popleft()
+        update_id = next(self.update_ids)
+        query_id = f"loadtest-{update_id}"
+        user = {"id": chat_id, "is_bot": False, "first_name": "Load"}
+        update = {
+            "update_id": update_id,
+            "callback_query": {
+                "id": query_id,
+                "from": user,
+                "chat_instance": str(chat_id),
+                "data": callback_data,
+                "message": {**self._message(chat_id, caption="launch"), "message_id": message_id},
+            },
+        }
+        self.stats.clicks += 1
+        self.pending_clicks.set(query_id, time.monotonic())
+        if self.webhook:
+            asyncio.create_task(self.post_webhook(update))
+        else:
+            self.updates.append(update)
+            self.updates_ready.set()
+
+    async def post_webhook(self, update: dict):
+        url, secret_token = self.webhook
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+        headers = {'X-Telegram-Bot-Api-Secret-Token': secret_token} if secret_token else {}
+        try:
+            async with self.session.post(url, json=update, headers=headers) as response:
+                if response.status != 200:
+                    print(f"Webhook answered {response.status}")
+        except aiohttp.ClientError as e:
+            print(f"Webhook POST failed: {e}")
+
+    def tasks(self):
+        if not self.click_rate:
+            return []
+        return [asyncio.create_task(RateEmitter(self.click_rate, self.click).run())]
+
+    async def handle_metadata(self, request: web.Request) -> web.Response:
+        mint = request.match_info['mint']
+        return web.json_response({
+            "name": f"Load Test {mint[:4]}",
+            "symbol": mint[:4],
+            "description": "Synthetic token for load testing",
+            "image": f"https://example.invalid/images/{mint[:2]}.png",
+        })
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def report(stats: Stats, elapsed: float, vybe: FakeVybeServer) -> float:
+    delivered = stats.messages + stats.photos
+    rate = delivered / max(elapsed, 1e-9)
+    latencies = stats.latencies
+    stats.latencies = []
+    click_latencies = stats.click_latencies
+    stats.click_latencies = []
+    print(f"[{elapsed:6.1f}s] trades {stats.trades} launches {stats.launches} frames {stats.frames} "
+          f"| vybe conns {len(vybe.clients)} filters {sum(len(c) for c in vybe.index.values())} "
+          f"| delivered {delivered} ({rate:,.0f} msg/s) 429s {stats.throttled} "
+          f"| disconnects {stats.disconnects} slow {stats.slow_consumers} "
+          f"| latency p50 {percentile(latencies, 0.5) * 1000:.1f}ms p99 {percentile(latencies, 0.99) * 1000:.1f}ms"
+          + (f" | clicks {stats.clicks} answered p50 {percentile(click_latencies, 0.5) * 1000:.1f}ms "
+             f"p99 {percentile(click_latencies, 0.99) * 1000:.1f}ms" if stats.clicks else ""))
+    return rate
+
+async def run(args):
+    host = args.host
+    pool = AddressPool(args.seed, args.trader_pool, args.dev_pool, args.token_pool, args.distribution, args.zipf_s)
+    if args.seed_db:
+        seed_database(args.seed_db, pool, args.users, args.addresses_per_user,
+                      args.devs_per_user, args.tokens_per_user, args.seed)
+
+    stats = Stats()
+    http_base = f"http://{host}:{args.telegram_port}"
+    vybe = FakeVybeServer(pool, stats, args.trade_rate, args.disconnect_interval, args.max_pending, args.seed)
+    pump = FakePumpPortalServer(pool, stats, args.launch_rate, args.disconnect_interval, args.max_pending, http_base, args.seed)
+    telegram = FakeTelegramServer(stats, args.telegram_latency, args.throttle_fraction, args.click_rate, args.seed)
+
+    app = web.Application(client_max_size=16 * 1024 * 1024)
+    telegram.routes(app)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, args.telegram_port).start()
+
+    vybe_server = await websockets.serve(vybe.handler, host, args.vybe_port, max_size=None)
+    pump_server = await websockets.serve(pump.handler, host, args.pump_port)
+    tasks = vybe.tasks() + pump.tasks() + telegram.tasks()
+
+    env = {
+        'WS_URL': f"ws://{host}:{args.vybe_port}",
+        'PUMPPORTAL_WS_URL': f"ws://{host}:{args.pump_port}",
+        'TELEGRAM_API_URL': f"{http_base}/bot",
+        'TELEGRAM_BOT_TOKEN': 'loadtest',
+        'API_KEY': 'loadtest',
+    }
+    if args.seed_db:
+        env['STATE_DB_PATH'] = args.seed_db
+    if args.webhook_port:
+        env['TELEGRAM_WEBHOOK_URL'] = f"http://{host}:{args.webhook_port}/telegram"
+        env['WEBHOOK_LISTEN'] = host
+        env['WEBHOOK_PORT'] = str(args.webhook_port)
+        env['WEBHOOK_SECRET_TOKEN'] = 'loadtest-secret'
+    if args.shard_workers:
+        env['SHARD_WORKERS'] = str(args.shard_workers)
+    print("Fake endpoints:", " ".join(f"{name}={value}" for name, value in env.items()))
+
+    bot = None
+    if args.run_bot:
+        bot = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot.py'),
+            env={**os.environ, **env}
+        )
+
+    started = time.monotonic()
+    rate = 0.0
+    try:
+        while args.duration is None or time.monotonic() - started < args.duration:
+            await asyncio.sleep(args.report_interval)
+            rate = report(stats, time.monotonic() - started, vybe)
+            if bot is not None and bot.returncode is not None:
+                print(f"bot.py exited with code {bot.returncode}")
+                break
+    finally:
+        if bot is not None and bot.returncode is None:
+            bot.terminate()
+            await bot.wait()
+        for task in tasks:
+            task.cancel()
+        vybe_server.close()
+        pump_server.close()
+        if telegram.session is not None:
+            await telegram.session.close()
+        await runner.cleanup()
+
+    if args.min_msg_rate is not None and rate < args.min_msg_rate:
+        print(f"FAIL: delivered {rate:,.0f} msg/s, below the required {args.min_msg_rate:,.0f} msg/s")
+        return 1
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Vybe, PumpPortal and Telegram servers for load testing")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--vybe-port', type=int, default=8765)
+    parser.add_argument('--pump-port', type=int, default=8766)
+    parser.add_argument('--telegram-port', type=int, default=8081)
+    parser.add_argument('--users', type=int, default=1000, help="synthetic users written by --seed-db")
+    parser.add_argument('--addresses-per-user', type=int, default=50, help="traders watched by each user")
+    parser.add_argument('--devs-per-user', type=int, default=5)
+    parser.add_argument('--tokens-per-user', type=int, default=0, help="trader-token pairs per user")
+    parser.add_argument('--trader-pool', type=int, default=50000, help="distinct trader addresses")
+    parser.add_argument('--dev-pool', type=int, default=20000, help="distinct dev addresses")
+    parser.add_argument('--token-pool', type=int, default=2000, help="distinct token mints")
+    parser.add_argument('--distribution', choices=('zipf', 'uniform'), default='zipf')
+    parser.add_argument('--zipf-s', type=float, default=1.1)
+    parser.add_argument('--trade-rate', type=float, default=2000, help="trades per second across the pool")
+    parser.add_argument('--launch-rate', type=float, default=20, help="pump.fun launches per second")
+    parser.add_argument('--disconnect-interval', type=float, default=0, help="seconds between forced disconnects (0 = never)")
+    parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING, help="frames buffered per client before dropping it")
+    parser.add_argument('--telegram-latency', type=float, default=0, help="seconds added to every send")
+    parser.add_argument('--throttle-fraction', type=float, default=0, help="fraction of sends answered with 429")
+    parser.add_argument('--click-rate', type=float, default=0, help="Track Dev button presses per second")
+    parser.add_argument('--webhook-port', type=int, default=0, help="run bot.py in webhook mode on this port (0 = polling)")
+    parser.add_argument('--shard-workers', type=int, default=0, help="run bot.py as an ingress with this many monitor workers")
+    parser.add_argument('--seed-db', help="SQLite path to pre-populate with synthetic users")
+    parser.add_argument('--run-bot', action='store_true', help="start bot.py against the fake endpoints")
+    parser.add_argument('--duration', type=float, help="seconds to run (default: until interrupted)")
+    parser.add_argument('--report-interval', type=float, default=5)
+    parser.add_argument('--min-msg-rate', type=float, help="exit non-zero if the average msg/s is below this")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    try:
+        sys.exit(asyncio.run(run(args)))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
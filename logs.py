@@ -0,0 +1,184 @@
+"""
+Non-blocking structured logging shared by every module.
+
+Modules log through ``get_logger('<subsystem>')`` (``mypal.vybe``,
+``mypal.pump``, ``mypal.send_queue``, ...). ``setup_logging`` puts a
+QueueHandler on the root logger, so callers only enqueue a record; a
+QueueListener thread does the formatting and the stdout write.
+
+Configuration:
+- ``LOG_LEVEL``: default level (INFO)
+- ``LOG_LEVELS``: per-subsystem overrides, e.g. ``vybe=DEBUG,send_queue=WARNING,httpx=INFO``
+- ``LOG_FORMAT``: ``text`` (default) or ``json``, one object per line
+- ``LOG_SAMPLE_RATE``: records per second let through for each per-message line
+  logged with ``extra=SAMPLED`` (default 5); the rest are counted and the count
+  is reported on the next line that gets through
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '5'))
+# Records waiting for the writer thread before new ones are dropped
+MAX_PENDING_RECORDS = 10000
+
+# Pass as ``extra`` on per-frame/per-message lines to have them rate limited
+SAMPLED = {'sampled': True}
+
+# Third-party loggers that are chatty at INFO (httpx logs every Bot API request)
+QUIET_LOGGERS = {'httpx': 'WARNING', 'httpcore': 'WARNING', 'websockets': 'WARNING', 'aiohttp.access': 'WARNING'}
+
+# Attributes every LogRecord has; anything else was passed with ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'sampled', 'suppressed'}
+
+def get_logger(subsystem: str) -> logging.Logger:
+    return logging.getLogger(f"mypal.{subsystem}")
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets at most ``rate`` records per second through for each message template
+    logged with ``extra=SAMPLED``; other records always pass.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        # Map of (logger, template) → [window start, records let through, records suppressed]
+        self.windows = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, 'sampled', False):
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        window = self.windows.get(key)
+        if window is None or now - window[0] >= 1:
+            suppressed = window[2] if window else 0
+            window = self.windows[key] = [now, 0, 0]
+            if suppressed:
+                record.suppressed = suppressed
+        if window[1] >= self.rate:
+            window[2] += 1
+            return False
+        window[1] += 1
+        return True
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that drops records instead of blocking when the writer falls behind.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Keep the record's own attributes (extras) instead of flattening it like the base class
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class TextFormatter(logging.Formatter):
+    """
+    ``time level logger message key=value ...``
+    """
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+        if getattr(record, 'suppressed', 0):
+            fields['suppressed'] = record.suppressed
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line with the message, level, logger and any extra fields.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+def parse_levels(spec: str) -> dict:
+    """
+    Turn ``vybe=DEBUG,httpx=INFO`` into logger name → level; bare subsystem names get the mypal. prefix.
+    """
+    levels = {}
+    for item in spec.split(','):
+        if '=' not in item:
+            continue
+        name, level = (part.strip() for part in item.split('=', 1))
+        if name and '.' not in name and name not in QUIET_LOGGERS:
+            name = f"mypal.{name}"
+        levels[name] = level.upper()
+    return levels
+
+_listener = None
+
+def setup_logging():
+    """
+    Route every logger through the queue-backed handler. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else TextFormatter())
+
+    log_queue = queue.Queue(maxsize=MAX_PENDING_RECORDS)
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+    for name, level in {**QUIET_LOGGERS, **parse_levels(LOG_LEVELS)}.items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+def shutdown_logging():
+    """
+    Flush queued records and stop the writer thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,89 @@
+"""
+Shared HTTP client and cache for pump.fun token metadata URIs.
+"""
+
+import asyncio
+import json
+import os
+import aiohttp
+
+from cache import TTLCache
+from logs import SAMPLED, get_logger
+from recorder import frame_recorder
+
+# Per-request timeout (seconds) for metadata fetches, so a slow IPFS gateway can't hold alerts forever
+FETCH_TIMEOUT = float(os.getenv('METADATA_FETCH_TIMEOUT', '5'))
+METADATA_CACHE_SIZE = int(os.getenv('METADATA_CACHE_SIZE', '5000'))
+METADATA_CACHE_TTL = float(os.getenv('METADATA_CACHE_TTL', '3600'))
+# Failed fetches are remembered briefly so a dead URI isn't hammered by every recipient
+FAILED_FETCH_TTL = 30
+
+logger = get_logger('metadata')
+
+class MetadataFetcher:
+    """
+    Fetches token metadata JSON over one pooled aiohttp session, with an LRU/TTL
+    cache keyed by URI and coalescing of concurrent requests for the same URI.
+    """
+
+    def __init__(self):
+        self.session = None
+        self.cache = TTLCache(METADATA_CACHE_SIZE, METADATA_CACHE_TTL)
+        # Map of uri → future shared by every caller waiting on the same fetch
+        self.inflight = {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=FETCH_TIMEOUT),
+                connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300)
+            )
+        return self.session
+
+    async def fetch(self, uri: str) -> dict:
+        """
+        Return the metadata dict for ``uri``, or an empty dict if it can't be fetched.
+        """
+        metadata = self.cache.get(uri)
+        if metadata is not None:
+            return metadata
+
+        future = self.inflight.get(uri)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.inflight[uri] = future
+            try:
+                metadata = await self._download(uri)
+                frame_recorder.record('metadata', json.dumps({"uri": uri, "metadata": metadata}))
+                self.cache.set(uri, metadata, ttl=None if metadata else FAILED_FETCH_TTL)
+                future.set_result(metadata)
+            finally:
+                del self.inflight[uri]
+                if not future.done():
+                    future.set_result({})
+            return metadata
+
+        return await asyncio.shield(future)
+
+    async def _download(self, uri: str) -> dict:
+        try:
+            async with self._get_session().get(uri) as response:
+                if response.status != 200:
+                    return {}
+                try:
+                    metadata = await response.json(content_type=None)
+                except ValueError:
+                    logger.warning("Non-JSON response for metadata URI %s", uri, extra=SAMPLED)
+                    return {}
+                return metadata if isinstance(metadata, dict) else {}
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("Could not fetch metadata URI %s: %r", uri, e, extra=SAMPLED)
+            return {}
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+# Process-wide fetcher shared by every pump.fun alert
+metadata_fetcher = MetadataFetcher()
@@ -0,0 +1,273 @@
+"""
+In-process metrics with a Prometheus text endpoint.
+
+Counters, gauges and histograms are plain Python objects updated on the event
+loop; nothing is computed until ``/metrics`` is scraped. Set METRICS_PORT to
+serve them (disabled by default). Modules that own their own counters (the
+send queue, the connection pools) expose them with ``CallbackMetric`` so the
+hot path doesn't pay twice.
+"""
+
+import asyncio
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from aiohttp import web
+
+from logs import get_logger
+
+METRICS_PORT = os.getenv('METRICS_PORT')
+METRICS_HOST = os.getenv('METRICS_HOST', '0.0.0.0')
+
+logger = get_logger('metrics')
+
+# Every metric registers itself here in definition order
+registry = []
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """
+    Base class for a metric family with optional labels.
+    """
+
+    type = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        # Map of label values → child holding the actual numbers
+        self.children = {}
+        registry.append(self)
+
+    def labels(self, *values):
+        """
+        Return the child for these label values; cache it at module level on hot paths.
+        """
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        """
+        Yield (suffix, label values, extra label, value) for every sample.
+        """
+        for values, child in list(self.children.items()):
+            yield "", values, "", child.value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, values, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, values, extra)} {_format_value(value)}")
+        return "\n".join(lines)
+
+class _CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+class Counter(Metric):
+    type = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+class _GaugeChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    @contextmanager
+    def track_inprogress(self):
+        self.value += 1
+        try:
+            yield
+        finally:
+            self.value -= 1
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = ()):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def samples(self):
+        for values, child in list(self.children.items()):
+            cumulative = 0
+            for bound, count in zip(child.bounds, child.counts):
+                cumulative += count
+                yield "_bucket", values, f'le="{_format_value(bound)}"', cumulative
+            yield "_bucket", values, 'le="+Inf"', child.count
+            yield "_sum", values, "", child.sum
+            yield "_count", values, "", child.count
+
+class CallbackMetric(Metric):
+    """
+    Metric whose value is read from ``callback`` at scrape time.
+
+    ``callback`` returns a number, or a dict of label value tuple → number when
+    ``labelnames`` is given.
+    """
+
+    def __init__(self, name: str, help_text: str, metric_type: str, callback, labelnames: tuple = ()):
+        super().__init__(name, help_text, labelnames)
+        self.type = metric_type
+        self.callback = callback
+
+    def samples(self):
+        result = self.callback()
+        if not self.labelnames:
+            yield "", (), "", result
+            return
+        for values, value in result.items():
+            yield "", values, "", value
+
+def render_all() -> str:
+    return "\n".join(metric.render() for metric in registry) + "\n"
+
+def observe_ack(child: _HistogramChild, started_at: float):
+    """
+    Return a future done-callback that records the time from ``started_at``
+    (wall-clock seconds) to a successful Telegram send.
+    """
+    def callback(future: asyncio.Future):
+        if not future.cancelled() and future.exception() is None and future.result() is not None:
+            child.observe(max(time.time() - started_at, 0.0))
+    return callback
+
+# Buckets for sub-millisecond to ~100ms in-process work
+PROCESSING_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+# Buckets for delays users can notice (blockTime only has one-second resolution)
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 3, 5, 10, 20, 30, 60, 120, 300)
+
+FRAMES_RECEIVED = Counter('mypal_frames_received_total', "Raw WebSocket frames received", ('source',))
+FRAMES_DECODED = Counter('mypal_frames_decoded_total', "Frames decoded into a JSON object", ('source',))
+FRAMES_PREFILTERED = Counter('mypal_frames_prefiltered_total', "Frames dropped by the address prefilter without being decoded", ('source',))
+FRAMES_FILTERED = Counter('mypal_frames_filtered_total', "Decoded frames that matched no user and were dropped", ('source',))
+FRAME_ERRORS = Counter('mypal_frame_errors_total', "Frames that failed to decode or route", ('source',))
+FRAME_PROCESSING = Histogram('mypal_frame_processing_seconds', "Time to decode and route one frame on the event loop",
+                             ('source',), PROCESSING_BUCKETS)
+ALERTS_ROUTED = Counter('mypal_alerts_routed_total', "Alerts handed to the send queue or digest buffer", ('kind',))
+SUBSCRIPTION_TASKS = Gauge('mypal_subscription_tasks', "Running monitoring tasks per subscription type", ('kind',))
+SEND_QUEUE_WAIT = Histogram('mypal_send_queue_wait_seconds', "Time alerts spend in the send queue before the API call",
+                            (), LATENCY_BUCKETS)
+TELEGRAM_REQUEST = Histogram('mypal_telegram_request_seconds', "Duration of Telegram API send calls",
+                             ('method',), PROCESSING_BUCKETS[4:] + (0.25, 0.5, 1, 2.5, 5, 10))
+ALERT_LATENCY = Histogram('mypal_alert_latency_seconds',
+                          "Seconds from on-chain blockTime (vybe) or frame receipt (pump) to Telegram send acknowledgement",
+                          ('source',), LATENCY_BUCKETS)
+def _task_count() -> int:
+    try:
+        return len(asyncio.all_tasks())
+    except RuntimeError: # Scraped outside the event loop
+        return 0
+
+CallbackMetric('mypal_asyncio_tasks', "Tasks alive on the event loop", 'gauge', _task_count)
+CallbackMetric('mypal_threads', "Live Python threads", 'gauge', threading.active_count)
+
+class MetricsServer:
+    """
+    Serves ``GET /metrics`` in the Prometheus text format from the bot's event loop,
+    plus any JSON views registered with ``add_view``.
+    """
+
+    def __init__(self, port: str = METRICS_PORT, host: str = METRICS_HOST):
+        self.port = int(port) if port else None
+        self.host = host
+        self.runner = None
+        # Map of path → callback returning a JSON-serializable object
+        self.views = {}
+
+    def add_view(self, path: str, callback):
+        self.views[path] = callback
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=render_all(), headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+    async def handle_view(self, request: web.Request) -> web.Response:
+        return web.json_response(self.views[request.path]())
+
+    async def start(self):
+        if self.port is None or self.runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle)
+        for path in self.views:
+            app.router.add_get(path, self.handle_view)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        logger.info("Serving metrics on http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+# Process-wide metrics endpoint, enabled by METRICS_PORT
+metrics_server = MetricsServer()
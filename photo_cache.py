@@ -0,0 +1,67 @@
+"""
+Reuse of Telegram file_ids for images sent to many chats.
+
+The first send of an image URL makes Telegram download it; the file_id from
+that message is cached so every later recipient gets the already-uploaded
+photo instead of another remote fetch.
+"""
+
+import asyncio
+import os
+
+from cache import TTLCache
+from send_queue import send_queue
+
+PHOTO_CACHE_SIZE = int(os.getenv('PHOTO_CACHE_SIZE', '2000'))
+PHOTO_CACHE_TTL = float(os.getenv('PHOTO_CACHE_TTL', '86400'))
+# Seconds a recipient waits for another chat's upload before sending the URL itself
+PHOTO_UPLOAD_WAIT = float(os.getenv('PHOTO_UPLOAD_WAIT', '2'))
+
+class PhotoCache:
+    """
+    Bounded image URL → Telegram file_id cache in front of ``send_queue.send_photo``.
+    """
+
+    def __init__(self):
+        self.file_ids = TTLCache(PHOTO_CACHE_SIZE, PHOTO_CACHE_TTL)
+        # Map of image URL → future resolving to the file_id of its first upload
+        self.uploads = {}
+
+    async def send_photo(self, chat_id: int, photo_url: str, **kwargs):
+        file_id = self.file_ids.get(photo_url)
+        if file_id:
+            return await send_queue.send_photo(chat_id, photo=file_id, **kwargs)
+
+        upload = self.uploads.get(photo_url)
+        if upload is not None:
+            # Another recipient is already uploading this image. Its send waits behind
+            # that chat's own backlog, so only wait briefly for its file_id
+            try:
+                file_id = await asyncio.wait_for(asyncio.shield(upload), PHOTO_UPLOAD_WAIT)
+            except asyncio.TimeoutError:
+                file_id = None
+            if file_id:
+                return await send_queue.send_photo(chat_id, photo=file_id, **kwargs)
+            return await self._send_url(chat_id, photo_url, kwargs)
+
+        upload = asyncio.get_running_loop().create_future()
+        self.uploads[photo_url] = upload
+        file_id = None
+        try:
+            message = await self._send_url(chat_id, photo_url, kwargs)
+            if message is not None and message.photo:
+                file_id = message.photo[-1].file_id
+            return message
+        finally:
+            del self.uploads[photo_url]
+            upload.set_result(file_id)
+
+    async def _send_url(self, chat_id: int, photo_url: str, kwargs: dict):
+        message = await send_queue.send_photo(chat_id, photo=photo_url, **kwargs)
+        if message is not None and message.photo:
+            # The last PhotoSize is the largest resolution
+            self.file_ids.set(photo_url, message.photo[-1].file_id)
+        return message
+
+# Process-wide cache shared by every photo alert
+photo_cache = PhotoCache()
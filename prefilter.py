@@ -0,0 +1,62 @@
+"""
+Byte-level prefilter and JSON decoding for the stream hot paths.
+
+Almost every frame on the pump.fun firehose (and any Vybe trade that slips past
+the server-side filters) is for an address nobody watches. Both streams route
+on a single top-level address field, so ``AddressPrefilter`` pulls that field
+straight out of the raw frame with one precompiled regex search and looks it
+up in the watched-address index. Only frames that pass are fully decoded.
+
+Decoding uses orjson when it is installed (``pip install orjson``) and falls
+back to the standard library otherwise.
+"""
+
+import json
+import os
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Set FRAME_PREFILTER=0 to decode every frame (e.g. when debugging routing)
+FRAME_PREFILTER = os.getenv('FRAME_PREFILTER', '1').lower() not in ('0', 'false', 'no')
+
+if orjson is not None:
+    JSON_BACKEND = 'orjson'
+    loads = orjson.loads
+else:
+    JSON_BACKEND = 'json'
+    loads = json.loads
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so one except clause covers both
+JSONDecodeError = json.JSONDecodeError
+
+# Solana addresses: 32-44 base58 characters
+BASE58_ADDRESS = r'[1-9A-HJ-NP-Za-km-z]{32,44}'
+
+class AddressPrefilter:
+    """
+    Decides from the raw frame whether ``field`` holds an address in ``watched``.
+    """
+
+    def __init__(self, field: str, watched, enabled: bool = FRAME_PREFILTER):
+        # Any container supporting ``in``: a set, or a dict keyed by address
+        self.watched = watched
+        self.enabled = enabled
+        self.pattern = re.compile(rf'"{re.escape(field)}"\s*:\s*"({BASE58_ADDRESS})"')
+
+    def is_candidate(self, raw) -> bool:
+        """
+        False only when the frame certainly carries an unwatched address; frames
+        the pattern can't read (binary, reformatted, field missing) are kept so
+        the full decode decides.
+        """
+        if not self.enabled:
+            return True
+        try:
+            match = self.pattern.search(raw)
+        except TypeError: # bytes frame
+            return True
+        return match is None or match.group(1) in self.watched
@@ -0,0 +1,230 @@
+"""
+Process-wide pump.fun new-token stream shared by every dev-monitoring user.
+
+One connection receives the ``subscribeNewToken`` firehose. Each event's
+``traderPublicKey`` is read from the raw frame and looked up in an inverted
+index of dev address → subscribed user_ids, and only launches by a watched dev
+are decoded, so the cost per event no longer depends on the number of users.
+"""
+
+import asyncio
+import json
+import os
+import time
+import websockets
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from logs import SAMPLED, get_logger
+from metadata import metadata_fetcher
+from metrics import (FRAMES_RECEIVED, FRAMES_PREFILTERED, FRAMES_DECODED, FRAMES_FILTERED, FRAME_ERRORS, FRAME_PROCESSING,
+                     ALERTS_ROUTED, ALERT_LATENCY, CallbackMetric, observe_ack)
+from photo_cache import photo_cache
+from prefilter import AddressPrefilter, JSONDecodeError, loads
+from recorder import frame_recorder
+from render import format_new_token
+from state import pending_vybe_tracks, make_track_id, snapshot
+from upstreams import CONNECT_OPTIONS, Upstream
+
+PUMPPORTAL_URI = os.getenv('PUMPPORTAL_WS_URL', "wss://pumpportal.fun/api/data")
+
+# Default image used when a launch has no image of its own
+PLACEHOLDER_IMAGE_URL = "https://via.placeholder.com/150"
+
+logger = get_logger('pump')
+
+# Metric children for the pump.fun hot path, resolved once
+PUMP_RECEIVED = FRAMES_RECEIVED.labels('pump')
+PUMP_PREFILTERED = FRAMES_PREFILTERED.labels('pump')
+PUMP_DECODED = FRAMES_DECODED.labels('pump')
+PUMP_FILTERED = FRAMES_FILTERED.labels('pump')
+PUMP_ERRORS = FRAME_ERRORS.labels('pump')
+PUMP_PROCESSING = FRAME_PROCESSING.labels('pump')
+PUMP_LATENCY = ALERT_LATENCY.labels('pump')
+
+class PumpFunStream:
+    """
+    Owns the single pump.fun connection and the dev address → user_ids index.
+    """
+
+    def __init__(self, connect: bool = True):
+        # When False no upstream connection is opened and frames are fed in with handle_frame (replay)
+        self.connect = connect
+        self.task = None
+        self.connected = False
+        # Alert deliveries in progress (kept referenced until they finish)
+        self.deliveries = set()
+        # Map of dev address → set of subscribed user_ids
+        self.dev_index = {}
+        # Map of user_id → set of dev addresses currently indexed for that user (users watching no devs are left out)
+        self.user_devs = {}
+        # Drops launches by unwatched devs before they are decoded
+        self.prefilter = AddressPrefilter('traderPublicKey', self.dev_index)
+
+    def register(self, user_id: int):
+        self.refresh_user(user_id)
+
+    def unregister(self, user_id: int):
+        for dev in self.user_devs.pop(user_id, frozenset()):
+            self._unindex(dev, user_id)
+
+    def refresh_user(self, user_id: int):
+        """
+        Bring the index in line with the user's current dev watchlist.
+        """
+        current = snapshot(user_id).devs
+        previous = self.user_devs.get(user_id, frozenset())
+        for dev in current - previous:
+            self.dev_index.setdefault(dev, set()).add(user_id)
+        for dev in previous - current:
+            self._unindex(dev, user_id)
+        if not current:
+            # Watching no devs doesn't need the firehose
+            self.user_devs.pop(user_id, None)
+            return
+        self.user_devs[user_id] = current
+        if self.connect and (self.task is None or self.task.done()):
+            self.task = asyncio.create_task(self.run())
+
+    def _unindex(self, dev: str, user_id: int):
+        users = self.dev_index.get(dev)
+        if users is None:
+            return
+        users.discard(user_id)
+        if not users:
+            del self.dev_index[dev]
+
+    async def close(self):
+        """
+        Stop the connection and any deliveries in progress, e.g. at shutdown.
+        """
+        tasks = list(self.deliveries)
+        if self.task is not None:
+            tasks.append(self.task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run(self):
+        link = PUMP_UPSTREAM.link()
+        while self.user_devs:
+            error = None
+            try:
+                async with websockets.connect(PUMPPORTAL_URI, **CONNECT_OPTIONS) as websocket:
+                    payload = {"method": "subscribeNewToken"}
+                    await websocket.send(json.dumps(payload))
+                    self.connected = True
+                    link.connected(websocket)
+
+                    while self.user_devs:
+                        message = await websocket.recv()
+                        link.frame()
+                        frame_recorder.record('pump', message)
+                        self.handle_frame(message)
+
+            except asyncio.CancelledError as e:
+                error = e
+                raise
+            except websockets.exceptions.ConnectionClosed as e:
+                logger.info("Pump.fun connection closed: %s", e)
+                error = e
+            except Exception as e:
+                logger.warning("Pump.fun connection error: %s", e)
+                error = e
+            finally:
+                self.connected = False
+                link.closed(error)
+
+            # Users hear about outages from PUMP_UPSTREAM, not about every dropped connection
+            if self.user_devs:
+                await link.wait()
+
+        logger.info("Pump.fun stream has no subscribers left, closing")
+
+    def handle_frame(self, message):
+        """
+        Decode one firehose frame and start delivery to the users watching its dev.
+        """
+        received_at = time.time()
+        started = time.perf_counter()
+        PUMP_RECEIVED.inc()
+        try:
+            if not self.prefilter.is_candidate(message):
+                PUMP_PREFILTERED.inc()
+                return
+            try:
+                token_data = loads(message)
+            except JSONDecodeError:
+                PUMP_ERRORS.inc()
+                return
+            if not isinstance(token_data, dict):
+                PUMP_FILTERED.inc()
+                return
+            PUMP_DECODED.inc()
+
+            user_ids = self.dev_index.get(token_data.get('traderPublicKey'))
+            if not user_ids:
+                PUMP_FILTERED.inc()
+                return
+            # Deliver off the receive loop so a slow metadata fetch can't stall the stream
+            delivery = asyncio.create_task(self.deliver(token_data, list(user_ids), received_at))
+            self.deliveries.add(delivery)
+            delivery.add_done_callback(self.deliveries.discard)
+        finally:
+            PUMP_PROCESSING.observe(time.perf_counter() - started)
+
+    async def deliver(self, token_data: dict, user_ids: list, received_at: float = None):
+        """
+        Fetch metadata and format the launch once, then send it to every subscribed user.
+        """
+        try:
+            metadata = {}
+            if token_data.get('uri'):
+                metadata = await metadata_fetcher.fetch(token_data['uri'])
+            image_url = metadata.get('image') or PLACEHOLDER_IMAGE_URL
+
+            formatted_message = format_new_token(token_data, metadata)
+        except Exception as e:
+            logger.warning("Error processing token in pump.fun stream: %s", e, extra=SAMPLED)
+            return
+
+        token_mint = token_data.get('mint')
+        fee_payer = token_data.get('traderPublicKey') # Dev address as fee payer
+
+        keyboard = None # Don't add button if data is missing
+        if token_mint and fee_payer:
+            # One pending entry per launch, shared by every recipient's button
+            pending_vybe_tracks.expire()
+            track_id = make_track_id()
+            pending_vybe_tracks.set(track_id, {'mint': token_mint, 'dev': fee_payer})
+            logger.debug("Stored pending track %s -> %s", track_id, token_mint, extra=SAMPLED)
+
+            keyboard = InlineKeyboardMarkup([[
+                InlineKeyboardButton("📊 Track Dev (Vybe)", callback_data=f"track_dev_vybe:{track_id}")
+            ]])
+
+        sends = []
+        for user_id in user_ids:
+            send = asyncio.ensure_future(photo_cache.send_photo(
+                user_id,
+                image_url,
+                caption=formatted_message,
+                parse_mode='HTML',
+                reply_markup=keyboard
+            ))
+            if received_at:
+                send.add_done_callback(observe_ack(PUMP_LATENCY, received_at))
+            sends.append(send)
+        ALERTS_ROUTED.labels('launch').inc(len(sends))
+
+        # The first recipient uploads the image, everyone else reuses its file_id
+        await asyncio.gather(*sends)
+
+# Process-wide stream shared by every dev-monitoring user
+pump_stream = PumpFunStream()
+
+PUMP_UPSTREAM = Upstream('pump', "Pump.fun", recipients=lambda: pump_stream.user_devs)
+
+CallbackMetric('mypal_pumpfun_connected', "1 while the pump.fun stream is connected", 'gauge',
+               lambda: int(pump_stream.connected))
+CallbackMetric('mypal_pumpfun_watched_devs', "Dev addresses in the pump.fun index", 'gauge',
+               lambda: len(pump_stream.dev_index))
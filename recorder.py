@@ -0,0 +1,85 @@
+"""
+Recorder for raw pump.fun and Vybe WebSocket frames.
+
+When RECORD_FRAMES_PATH is set, every received frame is appended to that file
+as one compact JSON line ``{"t": <receive time>, "src": "vybe"|"pump"|"metadata", "raw": <frame>}``.
+Writes happen on a background thread so recording never blocks the event loop.
+The resulting log can be pushed back through the bot with replay.py.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+RECORD_FRAMES_PATH = os.getenv('RECORD_FRAMES_PATH')
+# Frames waiting to be written before new ones are dropped
+MAX_PENDING_FRAMES = 100000
+
+class FrameRecorder:
+    """
+    Queue-backed JSONL writer for raw frames.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.queue = queue.Queue(maxsize=MAX_PENDING_FRAMES)
+        self.thread = None
+        self.dropped = 0
+        if path:
+            self.thread = threading.Thread(target=self._writer, name="frame-recorder", daemon=True)
+            self.thread.start()
+
+    @property
+    def enabled(self) -> bool:
+        return self.thread is not None
+
+    def record(self, source: str, raw):
+        if self.thread is None:
+            return
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf-8', errors='replace')
+        try:
+            self.queue.put_nowait((time.time(), source, raw))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def _writer(self):
+        with open(self.path, 'a', encoding='utf-8') as log:
+            last_flush = time.monotonic()
+            while True:
+                try:
+                    item = self.queue.get(timeout=1)
+                except queue.Empty:
+                    item = False
+                if item is None:
+                    break
+                if item:
+                    received_at, source, raw = item
+                    log.write(json.dumps({"t": received_at, "src": source, "raw": raw}, separators=(',', ':')))
+                    log.write("\n")
+                if time.monotonic() - last_flush >= 1:
+                    log.flush()
+                    last_flush = time.monotonic()
+
+def read_frames(path: str):
+    """
+    Yield (receive_time, source, raw) tuples from a recorded log.
+    """
+    with open(path, encoding='utf-8') as log:
+        for line in log:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            yield entry['t'], entry['src'], entry['raw']
+
+# Process-wide recorder, enabled by RECORD_FRAMES_PATH
+frame_recorder = FrameRecorder(RECORD_FRAMES_PATH)
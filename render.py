@@ -0,0 +1,143 @@
+"""
+HTML rendering for trade and launch alerts.
+
+A decoded trade is wrapped in a ``TradeAlert`` once per frame. Each variant
+(the trader's view, or the view from one tracked token, which decides whether
+it reads as a buy or a sell) is rendered at most once and the same string is
+sent to every recipient of that variant. Every value taken from a frame or
+from token metadata is HTML-escaped.
+"""
+
+import html
+from datetime import datetime
+from functools import lru_cache
+
+VYBE_WALLET_URL = "https://vybe.fyi/wallets/"
+VYBE_TOKEN_URL = "https://vybe.fyi/tokens/"
+SOLSCAN_TX_URL = "https://solscan.io/tx/"
+PUMP_COIN_URL = "https://pump.fun/coin/"
+
+# SOL's mint address - if base_mint is SOL, the trader is buying the other token
+SOL_MINT = "So11111111111111111111111111111111111111112"
+
+# Vybe trade prices are divided by this before display
+PRICE_SCALE = 100000
+
+def escape(value) -> str:
+    return html.escape(str(value))
+
+def is_token_buy(trade_data: dict, token_mint: str) -> bool:
+    """
+    A trade is a sell of the tracked token when the token is the base mint.
+    """
+    return trade_data.get('baseMintAddress', '') != token_mint
+
+def is_trader_buy(trade_data: dict) -> bool:
+    """
+    A trader buys when paying with SOL, i.e. SOL is the base mint.
+    """
+    return trade_data.get('baseMintAddress', '') == SOL_MINT
+
+@lru_cache(maxsize=1024)
+def format_block_time(block_time: int) -> str:
+    # Bursts of trades share a second, so each second is formatted once
+    return datetime.fromtimestamp(block_time).strftime('%Y-%m-%d %H:%M:%S')
+
+def _side(is_buy: bool) -> str:
+    return "🟢 <b>Token Bought</b>\n\n" if is_buy else "🔴 <b>Token Sold</b>\n\n"
+
+class TradeAlert:
+    """
+    One decoded Vybe trade and the alert variants rendered from it so far.
+    """
+
+    __slots__ = ('trade', 'variants', '_details')
+
+    def __init__(self, trade_data: dict):
+        self.trade = trade_data
+        # Map of tracked token mint (None for the trader's view) → rendered message
+        self.variants = {}
+        self._details = None
+
+    def render(self, token_mint: str = None) -> str:
+        """
+        The alert as seen from ``token_mint`` (dev trades and trader-token
+        pairs), or from the trader's wallet when ``token_mint`` is None.
+        """
+        message = self.variants.get(token_mint)
+        if message is None:
+            if token_mint:
+                message = self._token_header(token_mint) + self.details()
+            else:
+                message = self._trader_header() + self.details()
+            self.variants[token_mint] = message
+        return message
+
+    def _token_header(self, token_mint: str) -> str:
+        fee_payer = self.trade.get('feePayer')
+        token = escape(token_mint)
+        return (
+            f"{_side(is_token_buy(self.trade, token_mint))}"
+            f"<b>Token:</b><a href='{VYBE_TOKEN_URL}{token}'> {token}\n</a>"
+            f"<b>Fee Payer:</b><a href='{VYBE_WALLET_URL}{escape(fee_payer or '')}'> {escape(fee_payer or 'Unknown')}\n</a>"
+        )
+
+    def _trader_header(self) -> str:
+        fee_payer = escape(self.trade.get('feePayer', ''))
+        return (
+            f"{_side(is_trader_buy(self.trade))}"
+            f"<b>Trader:</b><a href='{VYBE_WALLET_URL}{fee_payer}'>{fee_payer}\n</a>"
+        )
+
+    def details(self) -> str:
+        """
+        Everything below the header, which is the same for every variant.
+        """
+        if self._details is None:
+            trade = self.trade
+            base_mint = trade.get('baseMintAddress')
+            quote_mint = trade.get('quoteMintAddress')
+            market_id = trade.get('marketId')
+            self._details = (
+                f"<b>Time:</b> {format_block_time(int(trade.get('blockTime') or 0))}\n\n"
+                f"<b>Price:</b> {float(trade.get('price') or 0) / PRICE_SCALE:.6f}\n"
+                f"<b>Base Amount:</b> {float(trade.get('baseSize') or 0):.6f}\n"
+                f"<b>Quote Amount:</b> {float(trade.get('quoteSize') or 0):.6f}\n"
+                f"<b>Base Token: </b><a href='{VYBE_TOKEN_URL}{escape(base_mint or '')}'> {escape(base_mint or 'Unknown')}\n</a>"
+                f"<b>Quote Token: </b><a href='{VYBE_TOKEN_URL}{escape(quote_mint or '')}'>{escape(quote_mint or 'Unknown')}\n\n</a>"
+                f"<b>Markets ID: </b><a href='{VYBE_WALLET_URL}{escape(market_id or '')}'>{escape(market_id or 'Unknown')}\n\n</a>"
+                f"<a href='{SOLSCAN_TX_URL}{escape(trade.get('signature') or '')}'>View Transaction</a>"
+            )
+        return self._details
+
+def format_new_token(token_data: dict, metadata: dict) -> str:
+    """
+    A pump.fun launch; name, description and links come from the launcher and are escaped.
+    """
+    mint = escape(token_data['mint'])
+    formatted_message = (
+        f"<u>Token Info (Pump.fun):</u>\n\n"
+        f"<b>{escape(token_data['name'])}</b>\n"
+    )
+    if metadata.get('description'):
+        formatted_message += f"{escape(metadata['description'])}\n\n"
+    formatted_message += (
+        f"Token Address: {mint}\n"
+        f"Ticker: {escape(token_data['symbol'])}\n"
+        f"Dev Buy: {escape(token_data['solAmount'])} SOL\n"
+        f"Dev Address: {escape(token_data['traderPublicKey'])}\n\n"
+    )
+    social_links = []
+    if metadata.get('twitter'):
+        social_links.append(f"<a href='{escape(metadata['twitter'])}'>X/Twitter</a>")
+    if metadata.get('website'):
+        social_links.append(f"<a href='{escape(metadata['website'])}'>Website</a>")
+    if metadata.get('telegram'):
+        social_links.append(f"<a href='{escape(metadata['telegram'])}'>Telegram</a>")
+    if social_links:
+        formatted_message += f"{' | '.join(social_links)}\n\n"
+    formatted_message += (
+        f"<a href='{PUMP_COIN_URL}{mint}'>Pump.fun</a> | "
+        f"<a href='{SOLSCAN_TX_URL}{escape(token_data['signature'])}'>Mint TX</a>"
+    )
+    return formatted_message
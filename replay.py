@@ -0,0 +1,191 @@
+"""
+Replay a recorded frame log through the bot's decode/filter/format path against a stub bot.
+
+Usage:
+    python replay.py frames.jsonl [--speed 1|10|max] [--users N] [--addresses-per-user K]
+
+Frames are fed into the same entry points the live connections use
+(websocket_handlers.on_message for Vybe, PumpFunStream.handle_frame for pump.fun)
+with no network access. Stub users watch addresses seen in the log, every
+outbound Telegram call is captured by the stub bot, and the run reports
+throughput and frame-to-send latency.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from types import SimpleNamespace
+
+from recorder import read_frames
+import state
+from metadata import metadata_fetcher
+from monitoring import subscribe_new_tokens, subscribe_trader_activity
+from pumpfun_stream import pump_stream
+from send_queue import send_queue
+from vybe_stream import vybe_hub
+from websocket_handlers import on_message
+
+SIGNATURE_PATTERN = re.compile(r"solscan\.io/tx/([1-9A-HJ-NP-Za-km-z]+)")
+
+class StubBot:
+    """
+    Stand-in for telegram.Bot that records every send and its latency from frame injection.
+    """
+
+    def __init__(self, injected_at: dict):
+        self.injected_at = injected_at
+        self.sent = 0
+        self.photos = 0
+        self.latencies = []
+
+    def _ack(self, text: str):
+        match = SIGNATURE_PATTERN.search(text or "")
+        if match and match.group(1) in self.injected_at:
+            self.latencies.append(time.perf_counter() - self.injected_at[match.group(1)])
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        self.sent += 1
+        self._ack(text)
+        return SimpleNamespace(chat_id=chat_id, text=text, photo=None)
+
+    async def send_photo(self, chat_id: int, photo, caption: str = None, **kwargs):
+        self.sent += 1
+        self.photos += 1
+        self._ack(caption)
+        return SimpleNamespace(chat_id=chat_id, caption=caption, photo=[SimpleNamespace(file_id=f"stub-{hash(photo)}")])
+
+def load_log(path: str):
+    frames = []
+    traders = set()
+    devs = set()
+    for received_at, source, raw in read_frames(path):
+        if source == 'metadata':
+            entry = json.loads(raw)
+            metadata_fetcher.cache.set(entry['uri'], entry['metadata'])
+            continue
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            frames.append((received_at, source, raw, None))
+            continue
+        frames.append((received_at, source, raw, data.get('signature')))
+        if source == 'vybe' and data.get('feePayer'):
+            traders.add(data['feePayer'])
+        elif source == 'pump':
+            if data.get('traderPublicKey'):
+                devs.add(data['traderPublicKey'])
+            # Never go to the network for metadata that wasn't recorded
+            if data.get('uri') and data['uri'] not in metadata_fetcher.cache:
+                metadata_fetcher.cache.set(data['uri'], {})
+    return frames, sorted(traders), sorted(devs)
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def replay(args):
+    frames, traders, devs = load_log(args.log)
+    if not frames:
+        print("No frames in log")
+        return
+
+    injected_at = {}
+    bot = StubBot(injected_at)
+    context = SimpleNamespace(bot=bot)
+
+    # Offline: no upstream connections, no Telegram rate limits unless asked for
+    vybe_hub.connect = False
+    pump_stream.connect = False
+    if not args.rate_limit:
+        send_queue.rate = float('inf')
+        send_queue.tokens = float('inf')
+        send_queue.per_chat_interval = 0
+    send_queue.start(bot)
+
+    rng = random.Random(args.seed)
+    tasks = []
+    for user_id in range(1, args.users + 1):
+        k = args.addresses_per_user
+        state.user_watchlists[user_id] = set(devs if not k or k >= len(devs) else rng.sample(devs, k))
+        state.trader_watchlists[user_id] = set(traders if not k or k >= len(traders) else rng.sample(traders, k))
+        state.active_monitoring.add(user_id)
+        state.active_trader_monitoring.add(user_id)
+        state.notify_change(user_id)
+        tasks.append(asyncio.create_task(subscribe_new_tokens(user_id, context)))
+        tasks.append(asyncio.create_task(subscribe_trader_activity(user_id, context)))
+    await asyncio.sleep(0)
+
+    print(f"Replaying {len(frames)} frames ({len(traders)} traders, {len(devs)} devs) "
+          f"to {args.users} users at {'max' if args.speed is None else f'{args.speed:g}x'} speed")
+
+    first_recorded = frames[0][0]
+    started = time.perf_counter()
+    for received_at, source, raw, signature in frames:
+        if args.speed is not None:
+            delay = (received_at - first_recorded) / args.speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        if signature:
+            injected_at[signature] = time.perf_counter()
+
+        if source == 'vybe':
+            for connection in list(vybe_hub.connections):
+                on_message(connection, raw)
+        elif source == 'pump':
+            pump_stream.handle_frame(raw)
+
+        # Yield so deliveries interleave with injection as they would live
+        await asyncio.sleep(0)
+    inject_done = time.perf_counter()
+
+    # Drain everything still in flight
+    while pump_stream.deliveries or send_queue.depth():
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+    finished = time.perf_counter()
+
+    for user_id in range(1, args.users + 1):
+        state.active_monitoring.discard(user_id)
+        state.active_trader_monitoring.discard(user_id)
+        state.notify_change(user_id)
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await send_queue.stop()
+
+    elapsed = finished - started
+    print(f"Frames injected:   {len(frames)} in {inject_done - started:.3f}s ({len(frames) / max(inject_done - started, 1e-9):,.0f} frames/s)")
+    print(f"Messages sent:     {bot.sent} ({bot.photos} photos) in {elapsed:.3f}s ({bot.sent / max(elapsed, 1e-9):,.0f} msg/s)")
+    print(f"Send queue:        {send_queue.stats()}")
+    if bot.latencies:
+        print(f"Frame→send latency: p50 {percentile(bot.latencies, 0.5) * 1000:.2f}ms "
+              f"p95 {percentile(bot.latencies, 0.95) * 1000:.2f}ms "
+              f"p99 {percentile(bot.latencies, 0.99) * 1000:.2f}ms "
+              f"max {max(bot.latencies) * 1000:.2f}ms")
+
+def parse_speed(value: str):
+    if value == 'max':
+        return None
+    speed = float(value.rstrip('x'))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded WebSocket frames against a stub bot")
+    parser.add_argument('log', help="JSONL log written with RECORD_FRAMES_PATH")
+    parser.add_argument('--speed', type=parse_speed, default=None, help="1, 10, ... or 'max' (default)")
+    parser.add_argument('--users', type=int, default=1, help="number of stub users")
+    parser.add_argument('--addresses-per-user', type=int, default=0, help="addresses each user watches (0 = all seen in the log)")
+    parser.add_argument('--rate-limit', action='store_true', help="keep the Telegram send rate limits on")
+    parser.add_argument('--seed', type=int, default=0)
+    asyncio.run(replay(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
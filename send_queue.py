@@ -0,0 +1,263 @@
+"""
+Central outbound queue for alert messages sent to Telegram.
+
+All alerts go through ``send_queue`` instead of calling ``bot.send_message`` /
+``bot.send_photo`` directly. The queue enforces a global token bucket and a
+per-chat minimum interval, serves chats round-robin so one flooded user can't
+starve the others, and honours ``RetryAfter`` by pausing the affected chat.
+"""
+
+import asyncio
+import os
+from collections import deque
+from datetime import timedelta
+from telegram.error import RetryAfter
+
+from logs import SAMPLED, get_logger
+from metrics import SEND_QUEUE_WAIT, TELEGRAM_REQUEST, CallbackMetric
+
+# Telegram allows roughly 30 messages per second overall...
+GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))
+# ...and about one message per second to the same chat
+PER_CHAT_INTERVAL = float(os.getenv('TELEGRAM_PER_CHAT_INTERVAL', '1.0'))
+# Oldest alerts are dropped once a chat has this many waiting
+MAX_PER_CHAT = int(os.getenv('SEND_QUEUE_MAX_PER_CHAT', '100'))
+# How many times a message is retried after RetryAfter before giving up
+MAX_RETRIES = 3
+# Seconds stop() keeps sending what is queued or in flight before cancelling the rest
+STOP_GRACE = 5
+
+logger = get_logger('send_queue')
+
+class SendQueue:
+    """
+    Rate-limited, fair outbound message scheduler.
+
+    ``send_message``/``send_photo`` return a future that resolves to the sent
+    ``Message``, or to None if the message was dropped or failed.
+    """
+
+    def __init__(self, rate: float = GLOBAL_RATE, per_chat_interval: float = PER_CHAT_INTERVAL, max_per_chat: int = MAX_PER_CHAT):
+        self.rate = rate
+        self.per_chat_interval = per_chat_interval
+        self.max_per_chat = max_per_chat
+        self.bot = None
+        self.task = None
+        # Map of chat_id → deque of pending (method, kwargs, future, attempts, enqueued_at)
+        self.chat_queues = {}
+        # Round-robin order of chat_ids that have pending messages
+        self.ready = deque()
+        # Map of chat_id → loop time before which that chat must not be sent to
+        self.next_allowed = {}
+        self.tokens = rate
+        self.last_refill = 0.0
+        self.wakeup = None
+        # Sends in flight (kept referenced until they finish)
+        self.deliveries = set()
+        # Counters
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retried = 0
+
+    def start(self, bot):
+        self.bot = bot
+        self.wakeup = asyncio.Event()
+        self.last_refill = asyncio.get_running_loop().time()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Keep sending until nothing is queued or in flight, or ``timeout`` seconds
+        pass. Returns True if everything was sent.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (self.chat_queues or self.deliveries) and self.task and not self.task.done():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            if self.deliveries:
+                await asyncio.wait(self.deliveries, timeout=min(remaining, 0.1))
+            else:
+                await asyncio.sleep(min(remaining, 0.1))
+        return not (self.chat_queues or self.deliveries)
+
+    async def stop(self):
+        """
+        Stop sending after up to STOP_GRACE seconds of draining. Whatever is
+        still queued or in flight then is counted as dropped and resolves to
+        None so nothing awaiting it hangs.
+        """
+        await self.drain(STOP_GRACE)
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.deliveries:
+            for delivery in self.deliveries:
+                delivery.cancel()
+            await asyncio.gather(*self.deliveries, return_exceptions=True)
+        left = 0
+        for queue in self.chat_queues.values():
+            for _, _, future, _, _ in queue:
+                self._resolve(future, None)
+                left += 1
+        self.dropped += left
+        self.chat_queues.clear()
+        self.ready.clear()
+        if left:
+            logger.warning("Send queue stopped with %d alerts unsent", left)
+
+    def send_message(self, chat_id: int, **kwargs) -> asyncio.Future:
+        return self.enqueue(chat_id, 'send_message', kwargs)
+
+    def send_photo(self, chat_id: int, **kwargs) -> asyncio.Future:
+        return self.enqueue(chat_id, 'send_photo', kwargs)
+
+    def enqueue(self, chat_id: int, method: str, kwargs: dict) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        queue = self.chat_queues.get(chat_id)
+        if queue is None:
+            queue = self.chat_queues[chat_id] = deque()
+            self.ready.append(chat_id)
+
+        if len(queue) >= self.max_per_chat:
+            # Shed the oldest alert rather than let one chat's backlog grow without bound
+            _, _, dropped_future, _, _ = queue.popleft()
+            self._resolve(dropped_future, None)
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                logger.warning("Send queue dropping alerts for chat %s (total dropped: %d)", chat_id, self.dropped)
+
+        queue.append((method, kwargs, future, 0, asyncio.get_running_loop().time()))
+        if self.wakeup:
+            self.wakeup.set()
+        return future
+
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self.chat_queues.values())
+
+    def stats(self) -> dict:
+        return {
+            'depth': self.depth(),
+            'chats_pending': len(self.chat_queues),
+            'sent': self.sent,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'retried': self.retried,
+        }
+
+    def _resolve(self, future: asyncio.Future, result):
+        if not future.done():
+            future.set_result(result)
+
+    def _refill(self, now: float):
+        self.tokens = min(self.rate, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def _next_ready_chat(self, now: float):
+        """
+        Pop the next chat in round-robin order whose per-chat interval has elapsed.
+        """
+        for _ in range(len(self.ready)):
+            chat_id = self.ready.popleft()
+            if self.next_allowed.get(chat_id, 0.0) <= now:
+                return chat_id
+            self.ready.append(chat_id)
+        return None
+
+    async def _sleep_or_wakeup(self, delay: float):
+        self.wakeup.clear()
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout=max(delay, 0.001))
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self.ready:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            now = loop.time()
+            self._refill(now)
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                continue
+
+            chat_id = self._next_ready_chat(now)
+            if chat_id is None:
+                # Every chat with pending messages is inside its per-chat interval
+                await self._sleep_or_wakeup(min(self.next_allowed.get(c, now) for c in self.ready) - now)
+                continue
+
+            queue = self.chat_queues[chat_id]
+            item = queue.popleft()
+            if queue:
+                self.ready.append(chat_id)
+            else:
+                del self.chat_queues[chat_id]
+
+            self.tokens -= 1
+            self.next_allowed[chat_id] = now + self.per_chat_interval
+            if len(self.next_allowed) > 10000:
+                self.next_allowed = {c: t for c, t in self.next_allowed.items() if t > now}
+
+            delivery = asyncio.create_task(self._deliver(chat_id, item))
+            self.deliveries.add(delivery)
+            delivery.add_done_callback(self.deliveries.discard)
+
+    async def _deliver(self, chat_id: int, item: tuple):
+        method, kwargs, future, attempts, enqueued_at = item
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        SEND_QUEUE_WAIT.observe(started - enqueued_at)
+        try:
+            result = await getattr(self.bot, method)(chat_id=chat_id, **kwargs)
+            TELEGRAM_REQUEST.labels(method).observe(loop.time() - started)
+            self.sent += 1
+            self._resolve(future, result)
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+            self.retried += 1
+            logger.info("Telegram asked to retry chat %s after %ss", chat_id, retry_after, extra=SAMPLED)
+            self.next_allowed[chat_id] = loop.time() + retry_after
+
+            if attempts < MAX_RETRIES:
+                queue = self.chat_queues.get(chat_id)
+                if queue is None:
+                    queue = self.chat_queues[chat_id] = deque()
+                    self.ready.append(chat_id)
+                queue.appendleft((method, kwargs, future, attempts + 1, enqueued_at))
+                self.wakeup.set()
+            else:
+                self.failed += 1
+                self._resolve(future, None)
+        except asyncio.CancelledError:
+            # Only happens when stop() gives up on a send still in flight
+            self.dropped += 1
+            self._resolve(future, None)
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.warning("Error sending %s to chat %s: %s", method, chat_id, e, extra=SAMPLED)
+            self._resolve(future, None)
+
+# Process-wide queue used for every outbound alert
+send_queue = SendQueue()
+
+CallbackMetric('mypal_send_queue_depth', "Alerts waiting in the send queue", 'gauge', send_queue.depth)
+CallbackMetric('mypal_send_queue_chats', "Chats with alerts waiting", 'gauge', lambda: len(send_queue.chat_queues))
+CallbackMetric('mypal_messages_sent_total', "Telegram messages sent", 'counter', lambda: send_queue.sent)
+CallbackMetric('mypal_messages_failed_total', "Telegram sends that failed", 'counter', lambda: send_queue.failed)
+CallbackMetric('mypal_messages_dropped_total', "Alerts shed because a chat's backlog was full or the queue stopped", 'counter', lambda: send_queue.dropped)
+CallbackMetric('mypal_messages_retried_total', "Sends retried after RetryAfter", 'counter', lambda: send_queue.retried)
@@ -0,0 +1,119 @@
+"""
+Monitor worker process for the sharded deployment (see shards.py).
+
+Started by the ingress with SHARD_INDEX set. The worker has no Telegram update
+stream of its own: it receives its users' snapshots over the shard socket,
+starts or stops their subscriptions to match, and sends their alerts through
+its own send queue.
+"""
+
+import asyncio
+import os
+import signal
+from types import SimpleNamespace
+from telegram import Bot
+from telegram.request import HTTPXRequest
+
+from digest import digest_buffer
+from logs import get_logger
+from metadata import metadata_fetcher
+from metrics import metrics_server
+from monitoring import start_dev_monitoring, stop_dev_monitoring, start_trader_monitoring, stop_trader_monitoring, shutdown_monitoring
+from recorder import frame_recorder
+from send_queue import STOP_GRACE, send_queue
+from shards import MAX_MESSAGE_SIZE, SHARD_INDEX, SHARD_SOCKET_PATH, decode_message, decode_snapshot, encode_message
+from state import pending_vybe_tracks, restore_snapshot
+
+# Attempts to reach the ingress socket before giving up
+CONNECT_ATTEMPTS = 20
+# Concurrent Bot API requests, as Application.builder() gives the single-process bot
+CONNECTION_POOL_SIZE = 256
+
+logger = get_logger('shards')
+
+def apply_state(user_id: int, data: dict, context):
+    """
+    Take over the user's snapshot from the ingress and start or stop their
+    subscriptions to match; running tasks follow watchlist edits themselves.
+    """
+    snap = decode_snapshot(data)
+    restore_snapshot(user_id, snap)
+    if snap.dev_active:
+        start_dev_monitoring(user_id, context)
+    else:
+        stop_dev_monitoring(user_id)
+    if snap.trader_active:
+        start_trader_monitoring(user_id, context)
+    else:
+        stop_trader_monitoring(user_id)
+
+def answer(message: dict):
+    if message.get('method') == 'pending_track':
+        return pending_vybe_tracks.get(message['track_id'])
+    return None
+
+async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, context):
+    while line := await reader.readline():
+        message = decode_message(line)
+        op = message.get('op')
+        if op == 'state':
+            apply_state(message['user_id'], message['state'], context)
+        elif op == 'request':
+            writer.write(encode_message({'op': 'reply', 'id': message['id'], 'result': answer(message)}))
+    logger.warning("Ingress closed the shard connection")
+
+async def connect(socket_path: str):
+    for _ in range(CONNECT_ATTEMPTS):
+        try:
+            return await asyncio.open_unix_connection(socket_path, limit=MAX_MESSAGE_SIZE)
+        except (FileNotFoundError, ConnectionRefusedError):
+            await asyncio.sleep(0.5)
+    return await asyncio.open_unix_connection(socket_path, limit=MAX_MESSAGE_SIZE)
+
+async def run_worker(index: int = SHARD_INDEX, socket_path: str = SHARD_SOCKET_PATH):
+    """
+    Serve shard ``index`` until the ingress goes away or SIGINT/SIGTERM.
+    """
+    bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
+    if not bot_token:
+        raise ValueError("Please set the TELEGRAM_BOT_TOKEN environment variable")
+    request = HTTPXRequest(connection_pool_size=CONNECTION_POOL_SIZE)
+    api_url = os.getenv('TELEGRAM_API_URL')
+    bot = Bot(bot_token, base_url=api_url, request=request) if api_url else Bot(bot_token, request=request)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError: # Windows
+            pass
+
+    async with bot:
+        send_queue.start(bot)
+        await metrics_server.start()
+        # Subscription tasks only need ``context.bot``
+        context = SimpleNamespace(bot=bot)
+
+        reader, writer = await connect(socket_path)
+        writer.write(encode_message({'op': 'hello', 'index': index, 'pid': os.getpid()}))
+        logger.info("Shard worker %d connected to %s", index, socket_path)
+
+        serving = asyncio.create_task(serve(reader, writer, context))
+        stopping = asyncio.create_task(stop.wait())
+        try:
+            await asyncio.wait({serving, stopping}, return_when=asyncio.FIRST_COMPLETED)
+            if serving.done() and not serving.cancelled() and serving.exception():
+                logger.error("Shard connection failed", exc_info=serving.exception())
+        finally:
+            serving.cancel()
+            stopping.cancel()
+            writer.close()
+            await shutdown_monitoring()
+            await metrics_server.stop()
+            digest_buffer.flush_all()
+            await send_queue.drain(STOP_GRACE)
+            await send_queue.stop()
+            await metadata_fetcher.close()
+            frame_recorder.close()
+    logger.info("Shard worker %d stopped", index)
@@ -0,0 +1,236 @@
+"""
+Sharded deployment: one ingress process and SHARD_WORKERS monitor workers on the same host.
+
+With SHARD_WORKERS unset (the default) everything runs in one process. With
+SHARD_WORKERS=N, ``python bot.py`` becomes the ingress: it owns the Telegram
+update stream, the handlers and the SQLite state store, and spawns N copies of
+itself as workers (``SHARD_INDEX`` set). Each worker owns the users whose
+``user_id % N`` equals its index, runs their subscriptions and Vybe/pump.fun
+connections, and sends their alerts, so decoding and formatting spread over N
+cores instead of one GIL.
+
+The processes talk over a Unix socket at SHARD_SOCKET_PATH, one JSON message
+per line. Every notify_change in the ingress sends the user's new snapshot to
+the owning worker, which applies it and starts or stops subscriptions; a
+worker that (re)connects first receives the snapshot of every user it owns.
+Workers answer lookups of state only they hold (pending Track Dev buttons).
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import signal
+import sys
+import tempfile
+from types import MappingProxyType
+
+from logs import get_logger
+from metrics import CallbackMetric
+from prefilter import loads
+from state import WatchlistSnapshot, add_change_listener, pending_vybe_tracks, published_users, snapshot
+
+# Number of monitor worker processes; 0 runs everything in one process
+SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', '0'))
+# Set by the ingress on the workers it spawns
+SHARD_INDEX = int(os.getenv('SHARD_INDEX')) if os.getenv('SHARD_INDEX') else None
+SHARD_SOCKET_PATH = os.getenv('SHARD_SOCKET_PATH') or os.path.join(tempfile.gettempdir(), f"mypal-shards-{os.getpid()}.sock")
+# Seconds before a worker that exited is started again
+SHARD_RESTART_DELAY = float(os.getenv('SHARD_RESTART_DELAY', '5'))
+# Seconds the ingress waits for a worker to answer a lookup
+SHARD_REQUEST_TIMEOUT = float(os.getenv('SHARD_REQUEST_TIMEOUT', '5'))
+# Longest IPC message line; a snapshot grows with the user's watchlists
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+if SHARD_INDEX is not None:
+    SHARD_ROLE = 'worker'
+elif SHARD_WORKERS > 0:
+    SHARD_ROLE = 'ingress'
+else:
+    SHARD_ROLE = 'single'
+
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot.py')
+
+logger = get_logger('shards')
+
+def shard_of(user_id: int, workers: int = SHARD_WORKERS) -> int:
+    return user_id % workers
+
+def encode_message(message: dict) -> bytes:
+    return json.dumps(message, separators=(',', ':')).encode() + b"\n"
+
+def decode_message(line: bytes) -> dict:
+    return loads(line)
+
+def encode_snapshot(snap: WatchlistSnapshot) -> dict:
+    return {
+        field: list(value) if isinstance(value, frozenset) else dict(value) if isinstance(value, MappingProxyType) else value
+        for field, value in snap._asdict().items()
+    }
+
+def decode_snapshot(data: dict) -> WatchlistSnapshot:
+    return WatchlistSnapshot(
+        devs=frozenset(data['devs']),
+        traders=frozenset(data['traders']),
+        dev_trades=frozenset(tuple(pair) for pair in data['dev_trades']),
+        trader_tokens=MappingProxyType(data['trader_tokens']),
+        dev_active=data['dev_active'],
+        trader_active=data['trader_active'],
+        digest_all=data['digest_all'],
+        digest_entries=frozenset(tuple(entry) for entry in data['digest_entries']),
+        digest_window=data['digest_window'],
+    )
+
+def worker_environment(index: int, workers: int, socket_path: str) -> dict:
+    """
+    Environment for worker ``index``: its shard identity plus its share of the
+    process-wide limits and its own metrics port and frame log.
+    """
+    env = dict(os.environ, SHARD_INDEX=str(index), SHARD_WORKERS=str(workers), SHARD_SOCKET_PATH=socket_path)
+    # Telegram's global limit is per bot token, so the workers split it
+    env['TELEGRAM_GLOBAL_RATE'] = str(float(os.getenv('TELEGRAM_GLOBAL_RATE', '30')) / workers)
+    if os.getenv('METRICS_PORT'):
+        env['METRICS_PORT'] = str(int(os.environ['METRICS_PORT']) + 1 + index)
+    if os.getenv('RECORD_FRAMES_PATH'):
+        env['RECORD_FRAMES_PATH'] = f"{os.environ['RECORD_FRAMES_PATH']}.{index}"
+    return env
+
+class ShardRouter:
+    """
+    Ingress side: spawns and supervises the workers and routes user state and lookups to them.
+    """
+
+    def __init__(self, workers: int = SHARD_WORKERS, socket_path: str = SHARD_SOCKET_PATH):
+        self.workers = workers
+        self.socket_path = socket_path
+        self.server = None
+        self.stopping = False
+        # Map of worker index → StreamWriter of its connection
+        self.writers = {}
+        # Tasks serving worker connections
+        self.connections = set()
+        # Map of worker index → running asyncio.subprocess.Process
+        self.processes = {}
+        self.supervisors = set()
+        # Map of request id → future waiting for the worker's reply
+        self.pending = {}
+        self.request_ids = itertools.count(1)
+        self.forwarded = 0
+        self.restarts = 0
+
+    async def start(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.server = await asyncio.start_unix_server(self.handle_worker, path=self.socket_path, limit=MAX_MESSAGE_SIZE)
+        add_change_listener(self.forward)
+        self.supervisors = {asyncio.create_task(self.supervise(index)) for index in range(self.workers)}
+        logger.info("Started %d shard workers on %s", self.workers, self.socket_path)
+
+    async def stop(self):
+        self.stopping = True
+        for process in self.processes.values():
+            if process.returncode is None:
+                process.send_signal(signal.SIGTERM)
+        if self.processes:
+            await asyncio.wait([asyncio.create_task(process.wait()) for process in self.processes.values()], timeout=10)
+            for process in self.processes.values():
+                if process.returncode is None:
+                    process.kill()
+        for task in self.supervisors | self.connections:
+            task.cancel()
+        await asyncio.gather(*self.supervisors, *self.connections, return_exceptions=True)
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    async def supervise(self, index: int):
+        env = worker_environment(index, self.workers, self.socket_path)
+        while not self.stopping:
+            process = await asyncio.create_subprocess_exec(sys.executable, BOT_SCRIPT, env=env)
+            self.processes[index] = process
+            code = await process.wait()
+            if self.stopping:
+                return
+            self.restarts += 1
+            logger.warning("Shard worker %d exited with code %s, restarting in %ss", index, code, SHARD_RESTART_DELAY)
+            await asyncio.sleep(SHARD_RESTART_DELAY)
+
+    async def handle_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        index = None
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            hello = decode_message(await reader.readline())
+            index = hello['index']
+            self.writers[index] = writer
+            logger.info("Shard worker %d connected (pid %s)", index, hello.get('pid'))
+
+            # Changes made from now on are forwarded live, so the full sync can't miss any
+            for user_id in published_users():
+                if shard_of(user_id, self.workers) == index:
+                    writer.write(encode_message({'op': 'state', 'user_id': user_id, 'state': encode_snapshot(snapshot(user_id))}))
+                    await writer.drain()
+
+            while line := await reader.readline():
+                message = decode_message(line)
+                if message.get('op') == 'reply':
+                    future = self.pending.pop(message['id'], None)
+                    if future is not None and not future.done():
+                        future.set_result(message.get('result'))
+        except (ConnectionError, ValueError, KeyError) as e:
+            logger.warning("Shard worker %s connection error: %s", index, e)
+        finally:
+            if index is not None and self.writers.get(index) is writer:
+                del self.writers[index]
+                (logger.info if self.stopping else logger.warning)("Shard worker %d disconnected", index)
+            writer.close()
+            self.connections.discard(task)
+
+    def forward(self, user_id: int):
+        """
+        Change listener: send the user's new snapshot to the worker that owns them.
+        A worker that isn't connected gets it in the full sync when it connects.
+        """
+        writer = self.writers.get(shard_of(user_id, self.workers))
+        if writer is None:
+            return
+        writer.write(encode_message({'op': 'state', 'user_id': user_id, 'state': encode_snapshot(snapshot(user_id))}))
+        self.forwarded += 1
+
+    async def request(self, user_id: int, method: str, **params):
+        """
+        Ask the worker that owns ``user_id``; returns its answer, or None if it is unavailable.
+        """
+        writer = self.writers.get(shard_of(user_id, self.workers))
+        if writer is None:
+            return None
+        request_id = next(self.request_ids)
+        future = self.pending[request_id] = asyncio.get_running_loop().create_future()
+        writer.write(encode_message({'op': 'request', 'id': request_id, 'method': method, **params}))
+        try:
+            return await asyncio.wait_for(future, SHARD_REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Shard worker %d did not answer %s in time", shard_of(user_id, self.workers), method)
+            return None
+        finally:
+            self.pending.pop(request_id, None)
+
+# Ingress-side router; only started when SHARD_ROLE is 'ingress'
+shard_router = ShardRouter()
+
+async def lookup_pending_track(user_id: int, track_id: str):
+    """
+    The pending Track Dev entry behind a button. Buttons are issued by the
+    process that sent the alert, which is the user's worker when sharded.
+    """
+    if SHARD_ROLE == 'ingress':
+        return await shard_router.request(user_id, 'pending_track', track_id=track_id)
+    return pending_vybe_tracks.get(track_id)
+
+CallbackMetric('mypal_shard_workers_connected', "Shard workers connected to the ingress", 'gauge',
+               lambda: len(shard_router.writers))
+CallbackMetric('mypal_shard_worker_restarts', "Shard workers restarted after exiting", 'counter',
+               lambda: shard_router.restarts)
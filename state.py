@@ -2,6 +2,18 @@
 Global state variables and data structures used throughout the bot.
 """
 
+import asyncio
+import os
+import secrets
+import time
+from types import MappingProxyType
+from typing import NamedTuple
+
+from cache import TTLCache
+from logs import get_logger
+
+logger = get_logger('state')
+
 # User watchlists for monitoring developers
 user_watchlists = {}
 
@@ -14,11 +26,187 @@ trader_watchlists = {}
 # Set of active trader monitoring user IDs
 active_trader_monitoring = set()
 
-# Dictionary to store pending Vybe tracks keyed by user_id:track_id
-pending_vybe_tracks = {} 
+# How long a "Track Dev (Vybe)" button keeps working, and how many can be pending at once
+PENDING_TRACK_TTL = float(os.getenv('PENDING_TRACK_TTL', '86400'))
+PENDING_TRACK_MAX = int(os.getenv('PENDING_TRACK_MAX', '50000'))
+
+# Pending Vybe tracks keyed by track_id → {'mint', 'dev'}, one entry per launch shared by every recipient
+pending_vybe_tracks = TTLCache(PENDING_TRACK_MAX, PENDING_TRACK_TTL)
+
+def make_track_id() -> str:
+    """
+    Short callback id ``<unix time in hex>-<random>``; the timestamp lets a click
+    on an expired button be told apart from an unknown one.
+    """
+    return f"{int(time.time()):x}-{secrets.token_hex(3)}"
+
+def track_id_age(track_id: str):
+    """
+    Seconds since ``track_id`` was issued, or None if it isn't in the make_track_id format.
+    """
+    issued, separator, _ = track_id.partition('-')
+    if not separator:
+        return None # Pre-timestamp ids (plain uuid hex)
+    try:
+        age = time.time() - int(issued, 16)
+    except ValueError:
+        return None
+    return age if age >= 0 else None
 
 # User watchlists for monitoring dev trades (separate from regular dev watchlist)
+# Map of user_id → set of (dev_address, token_mint) pairs being tracked, one per Track Dev click
 dev_trade_watchlists = {}
 
 # Map of user_id → dictionary of trader_address → token_address
-trader_token_watchlists = {} 
\ No newline at end of file
+trader_token_watchlists = {}
+
+# Set of user IDs that receive every watchlist entry's trades as periodic digests
+digest_users = set()
+
+# Map of user_id → set of watchlist entries whose trades are sent as digests, keyed like
+# the Vybe filters: (trader or dev address, token_mint or None for a plain trader entry)
+digest_entries = {}
+
+# Map of user_id → digest window in seconds (DEFAULT_DIGEST_WINDOW when unset)
+digest_windows = {}
+DEFAULT_DIGEST_WINDOW = 60
+
+class WatchlistSnapshot(NamedTuple):
+    """
+    Immutable view of one user's watchlists, monitoring flags and digest settings.
+    """
+    devs: frozenset
+    traders: frozenset
+    dev_trades: frozenset
+    trader_tokens: MappingProxyType
+    dev_active: bool
+    trader_active: bool
+    digest_all: bool = False
+    digest_entries: frozenset = frozenset()
+    digest_window: float = DEFAULT_DIGEST_WINDOW
+
+    def entry_keys(self) -> set:
+        """
+        Every Vybe-monitored watchlist entry as a (address, token_mint or None) key.
+        """
+        return {(trader, None) for trader in self.traders} | set(self.trader_tokens.items()) | self.dev_trades
+
+    def wants_digest(self, key: tuple) -> bool:
+        return self.digest_all or key in self.digest_entries
+
+EMPTY_SNAPSHOT = WatchlistSnapshot(frozenset(), frozenset(), frozenset(), MappingProxyType({}), False, False)
+
+# Map of user_id → latest published WatchlistSnapshot. Entries are replaced, never mutated,
+# so readers (subscription tasks, the storage writer thread) can use them without locks.
+_snapshots = {}
+
+def snapshot(user_id: int) -> WatchlistSnapshot:
+    """
+    Return the user's latest published snapshot.
+    """
+    return _snapshots.get(user_id, EMPTY_SNAPSHOT)
+
+def publish_snapshot(user_id: int):
+    """
+    Copy the user's mutable state into a new snapshot and swap it in atomically.
+    """
+    entries = digest_entries.get(user_id)
+    if entries:
+        # Drop digest settings of deleted entries so re-adding one starts out immediate
+        watched = {(trader, None) for trader in trader_watchlists.get(user_id, ())}
+        watched |= set(trader_token_watchlists.get(user_id, {}).items())
+        watched |= dev_trade_watchlists.get(user_id, set())
+        entries &= watched
+        if not entries:
+            del digest_entries[user_id]
+    _snapshots[user_id] = WatchlistSnapshot(
+        devs=frozenset(user_watchlists.get(user_id, ())),
+        traders=frozenset(trader_watchlists.get(user_id, ())),
+        dev_trades=frozenset(dev_trade_watchlists.get(user_id, ())),
+        trader_tokens=MappingProxyType(dict(trader_token_watchlists.get(user_id, {}))),
+        dev_active=user_id in active_monitoring,
+        trader_active=user_id in active_trader_monitoring,
+        digest_all=user_id in digest_users,
+        digest_entries=frozenset(digest_entries.get(user_id, ())),
+        digest_window=digest_windows.get(user_id, DEFAULT_DIGEST_WINDOW),
+    )
+
+def published_users() -> list:
+    """
+    Every user_id with a published snapshot.
+    """
+    return list(_snapshots)
+
+def _assign(mapping: dict, user_id: int, value):
+    if value:
+        mapping[user_id] = value
+    else:
+        mapping.pop(user_id, None)
+
+def _flag(members: set, user_id: int, enabled: bool):
+    if enabled:
+        members.add(user_id)
+    else:
+        members.discard(user_id)
+
+def restore_snapshot(user_id: int, snap: WatchlistSnapshot):
+    """
+    Overwrite the user's mutable state with ``snap`` and notify, as if a handler
+    had made the change locally (sharded workers receive their users' state this way).
+    """
+    _assign(user_watchlists, user_id, set(snap.devs))
+    _assign(trader_watchlists, user_id, set(snap.traders))
+    _assign(dev_trade_watchlists, user_id, set(snap.dev_trades))
+    _assign(trader_token_watchlists, user_id, dict(snap.trader_tokens))
+    _assign(digest_entries, user_id, set(snap.digest_entries))
+    _flag(active_monitoring, user_id, snap.dev_active)
+    _flag(active_trader_monitoring, user_id, snap.trader_active)
+    _flag(digest_users, user_id, snap.digest_all)
+    if snap.digest_window != DEFAULT_DIGEST_WINDOW:
+        digest_windows[user_id] = snap.digest_window
+    else:
+        digest_windows.pop(user_id, None)
+    notify_change(user_id)
+
+# Per-user asyncio events that are set whenever that user's watchlists or monitoring flags change
+_change_waiters = {}
+
+# Callbacks invoked with the user_id whenever that user's watchlists or monitoring flags change
+_change_listeners = []
+
+def notify_change(user_id: int):
+    """
+    Signal that a user's watchlists or monitoring flags were mutated.
+    Handlers must call this after every change to the structures above.
+    """
+    publish_snapshot(user_id)
+
+    for listener in list(_change_listeners):
+        try:
+            listener(user_id)
+        except Exception:
+            logger.exception("Error in change listener for user %s", user_id)
+
+    for event in _change_waiters.pop(user_id, ()):
+        event.set()
+
+async def wait_for_change(user_id: int):
+    """
+    Wait until notify_change is called for this user.
+    """
+    event = asyncio.Event()
+    _change_waiters.setdefault(user_id, set()).add(event)
+    try:
+        await event.wait()
+    finally:
+        waiters = _change_waiters.get(user_id)
+        if waiters is not None:
+            waiters.discard(event)
+            if not waiters:
+                del _change_waiters[user_id]
+
+def add_change_listener(callback):
+    """
+    Register a callback(user_id) run synchronously on every notify_change.
+    """
+    _change_listeners.append(callback)
@@ -0,0 +1,177 @@
+"""
+Persistent SQLite backing store for the in-memory state in state.py.
+
+The dicts and sets in state.py remain the source of truth while the bot runs.
+Every notify_change marks the user dirty; a background task periodically
+writes all dirty users in one batched transaction (write-behind), and on
+startup the whole store is bulk-loaded back into state.py.
+"""
+
+import asyncio
+import os
+import sqlite3
+
+from logs import get_logger
+from state import (user_watchlists, trader_watchlists, dev_trade_watchlists, trader_token_watchlists,
+                   active_monitoring, active_trader_monitoring, digest_users, digest_entries, digest_windows,
+                   add_change_listener, publish_snapshot, snapshot)
+
+DB_PATH = os.getenv('STATE_DB_PATH', 'mypal.db')
+# Seconds between write-behind flushes
+FLUSH_INTERVAL = float(os.getenv('STATE_FLUSH_INTERVAL', '1.0'))
+
+logger = get_logger('storage')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watchlist_entries (
+    user_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    address TEXT NOT NULL,
+    token TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (user_id, kind, address, token)
+);
+CREATE TABLE IF NOT EXISTS active_flags (
+    user_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    PRIMARY KEY (user_id, kind)
+);
+CREATE TABLE IF NOT EXISTS user_settings (
+    user_id INTEGER PRIMARY KEY,
+    digest_window REAL
+);
+"""
+
+class StateStore:
+    """
+    Write-behind SQLite store (WAL mode) for user watchlists and monitoring flags.
+    """
+
+    def __init__(self, path: str = DB_PATH, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.conn = None
+        self.dirty_users = set()
+        self.task = None
+        self.stopping = None
+
+    def open(self):
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        add_change_listener(self.mark_dirty)
+
+    def load(self):
+        """
+        Bulk-load every stored user into the state.py structures.
+        """
+        rows = self.conn.execute("SELECT user_id, kind, address, token FROM watchlist_entries").fetchall()
+        for user_id, kind, address, token in rows:
+            token = token or None # Stored as '' so entries without a token stay unique in the key
+            if kind == 'dev':
+                user_watchlists.setdefault(user_id, set()).add(address)
+            elif kind == 'trader':
+                trader_watchlists.setdefault(user_id, set()).add(address)
+            elif kind == 'dev_trade':
+                dev_trade_watchlists.setdefault(user_id, set()).add((address, token))
+            elif kind == 'trader_token':
+                trader_token_watchlists.setdefault(user_id, {})[address] = token
+            elif kind == 'digest':
+                digest_entries.setdefault(user_id, set()).add((address, token))
+
+        flags = self.conn.execute("SELECT user_id, kind FROM active_flags").fetchall()
+        for user_id, kind in flags:
+            if kind == 'dev':
+                active_monitoring.add(user_id)
+            elif kind == 'trader':
+                active_trader_monitoring.add(user_id)
+            elif kind == 'digest':
+                digest_users.add(user_id)
+
+        settings = self.conn.execute("SELECT user_id, digest_window FROM user_settings").fetchall()
+        for user_id, digest_window in settings:
+            if digest_window:
+                digest_windows[user_id] = digest_window
+
+        for user_id in {row[0] for row in rows} | {flag[0] for flag in flags} | {setting[0] for setting in settings}:
+            publish_snapshot(user_id)
+
+        logger.info("Loaded %d watchlist entries and %d active monitors from %s", len(rows), len(flags), self.path)
+
+    def mark_dirty(self, user_id: int):
+        self.dirty_users.add(user_id)
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.stopping = asyncio.Event()
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            # Not cancelled: a flush in progress must finish with the connection before it is closed
+            self.stopping.set()
+            await self.task
+            self.task = None
+        await self.flush()
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+    async def _run(self):
+        while not self.stopping.is_set():
+            try:
+                await asyncio.wait_for(self.stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Error flushing state to %s", self.path)
+
+    async def flush(self):
+        """
+        Write every dirty user's current state in a single transaction.
+        """
+        if not self.dirty_users or not self.conn:
+            return
+        users = self.dirty_users
+        self.dirty_users = set()
+
+        # Immutable snapshots can be handed to the writer thread as-is
+        snapshots = {user_id: snapshot(user_id) for user_id in users}
+        try:
+            await asyncio.to_thread(self._write, snapshots)
+        except Exception:
+            # Keep the users dirty so the next flush retries them
+            self.dirty_users |= users
+            raise
+
+    def _write(self, snapshots: dict):
+        users = [(user_id,) for user_id in snapshots]
+        entries = []
+        flags = []
+        settings = []
+        for user_id, snap in snapshots.items():
+            entries.extend((user_id, 'dev', address, '') for address in snap.devs)
+            entries.extend((user_id, 'trader', address, '') for address in snap.traders)
+            entries.extend((user_id, 'dev_trade', address, token) for address, token in snap.dev_trades)
+            entries.extend((user_id, 'trader_token', address, token) for address, token in snap.trader_tokens.items())
+            if snap.dev_active:
+                flags.append((user_id, 'dev'))
+            entries.extend((user_id, 'digest', address, token or '') for address, token in snap.digest_entries)
+            if snap.trader_active:
+                flags.append((user_id, 'trader'))
+            if snap.digest_all:
+                flags.append((user_id, 'digest'))
+            settings.append((user_id, snap.digest_window))
+
+        with self.conn:
+            self.conn.executemany("DELETE FROM watchlist_entries WHERE user_id = ?", users)
+            self.conn.executemany("DELETE FROM active_flags WHERE user_id = ?", users)
+            self.conn.executemany("INSERT INTO watchlist_entries (user_id, kind, address, token) VALUES (?, ?, ?, ?)", entries)
+            self.conn.executemany("INSERT INTO active_flags (user_id, kind) VALUES (?, ?)", flags)
+            self.conn.executemany("INSERT OR REPLACE INTO user_settings (user_id, digest_window) VALUES (?, ?)", settings)
+
+# Process-wide store backing state.py
+state_store = StateStore()
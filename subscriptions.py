@@ -0,0 +1,101 @@
+"""
+Registry that owns every monitoring task.
+
+Tasks are keyed by ``(user_id, kind, address, token)``, so starting a
+subscription that is already running is a no-op, stopping one cancels its
+task immediately instead of waiting for it to notice, and ``running()`` lists
+exactly what is live.
+
+In a sharded deployment the ingress registry stays empty: the worker that owns
+the user starts the tasks when it receives the user's snapshot (shards.py).
+"""
+
+import asyncio
+from collections import Counter
+from typing import NamedTuple
+
+from logs import get_logger
+from metrics import CallbackMetric
+from shards import SHARD_ROLE
+
+logger = get_logger('subscriptions')
+
+class SubscriptionKey(NamedTuple):
+    user_id: int
+    # 'new_tokens', 'trader_activity', 'trader_token' or 'dev_trade'
+    kind: str
+    address: str = None
+    token: str = None
+
+class SubscriptionRegistry:
+    """
+    Map of SubscriptionKey → running asyncio.Task.
+    """
+
+    def __init__(self, enabled: bool = True):
+        # False in the sharded ingress, where start() is a no-op
+        self.enabled = enabled
+        self.tasks = {}
+
+    def start(self, key: SubscriptionKey, factory) -> bool:
+        """
+        Run ``factory()`` as the task for ``key`` unless one is already running.
+        Returns True if a new task was started.
+        """
+        if not self.enabled:
+            return False
+        task = self.tasks.get(key)
+        if task is not None and not task.done():
+            return False
+        task = asyncio.create_task(factory(), name=f"subscription:{key.kind}:{key.user_id}")
+        self.tasks[key] = task
+        task.add_done_callback(lambda finished: self._finished(key, finished))
+        return True
+
+    def _finished(self, key: SubscriptionKey, task: asyncio.Task):
+        if self.tasks.get(key) is task:
+            del self.tasks[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Subscription %s failed", key, exc_info=task.exception())
+
+    def is_running(self, key: SubscriptionKey) -> bool:
+        task = self.tasks.get(key)
+        return task is not None and not task.done()
+
+    def stop(self, key: SubscriptionKey) -> bool:
+        # Forget the task right away so an immediate restart isn't mistaken for a duplicate
+        task = self.tasks.pop(key, None)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    def stop_user(self, user_id: int, kinds: tuple = None) -> int:
+        """
+        Cancel the user's subscriptions of the given kinds (all kinds if None).
+        """
+        keys = [key for key in self.tasks if key.user_id == user_id and (kinds is None or key.kind in kinds)]
+        return sum(self.stop(key) for key in keys)
+
+    async def stop_all(self):
+        """
+        Cancel every task and wait until they have run their cleanup.
+        """
+        tasks = list(self.tasks.values())
+        self.tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def running(self, user_id: int = None) -> list:
+        return [key for key, task in self.tasks.items()
+                if not task.done() and (user_id is None or key.user_id == user_id)]
+
+    def counts(self) -> dict:
+        return Counter(key.kind for key in self.running())
+
+# Process-wide registry of monitoring tasks
+subscriptions = SubscriptionRegistry(enabled=SHARD_ROLE != 'ingress')
+
+CallbackMetric('mypal_subscriptions', "Monitoring tasks owned by the subscription registry", 'gauge',
+               lambda: {(kind,): count for kind, count in subscriptions.counts().items()}, ('kind',))
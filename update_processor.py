@@ -0,0 +1,85 @@
+"""
+Concurrent Telegram update processing with per-user ordering.
+
+Updates from different users are handled in parallel (up to UPDATE_CONCURRENCY
+at once), so one user's slow callback can't hold up everyone else. Updates from
+the same user still run one at a time in arrival order, which keeps multi-step
+``context.user_data`` flows (e.g. trader address → token address) and that
+user's state.py mutations consistent.
+"""
+
+import asyncio
+import os
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from metrics import CallbackMetric
+
+# Maximum number of updates processed at the same time across all users
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '256'))
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Runs updates concurrently but serializes the ones that belong to the same user.
+    """
+
+    def __init__(self, max_concurrent_updates: int = UPDATE_CONCURRENCY):
+        super().__init__(max_concurrent_updates)
+        # Map of user_id → [lock, number of updates holding or waiting for it]
+        self.user_locks = {}
+
+    @staticmethod
+    def update_owner(update: object):
+        """
+        The user (or chat, for updates without a user) whose updates must stay ordered.
+        """
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user is not None:
+            return update.effective_user.id
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        return None
+
+    async def process_update(self, update: object, coroutine):
+        """
+        Wait for the user's previous updates first, then for a global slot, so
+        updates queued behind a slow one of the same user don't hold slots other
+        users could run in.
+        """
+        owner = self.update_owner(update)
+        if owner is None:
+            await super().process_update(update, coroutine)
+            return
+
+        entry = self.user_locks.get(owner)
+        if entry is None:
+            entry = self.user_locks[owner] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            # asyncio.Lock wakes waiters first-come first-served, preserving arrival order
+            async with entry[0]:
+                await super().process_update(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self.user_locks[owner]
+
+    async def do_process_update(self, update: object, coroutine):
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+# Process-wide processor handed to Application.builder().concurrent_updates()
+update_processor = PerUserUpdateProcessor()
+
+CallbackMetric('mypal_updates_in_progress', "Telegram updates holding a processing slot", 'gauge',
+               lambda: update_processor.current_concurrent_updates)
+CallbackMetric('mypal_updates_waiting', "Telegram updates waiting for an earlier update of the same user", 'gauge',
+               lambda: sum(entry[1] - 1 for entry in update_processor.user_locks.values()))
+CallbackMetric('mypal_update_users_busy', "Users with an update in progress", 'gauge',
+               lambda: len(update_processor.user_locks))
@@ -0,0 +1,342 @@
+"""
+Reconnect policy and health tracking for the upstream WebSocket endpoints.
+
+Every reconnecting loop (each Vybe pool connection, the pump.fun stream) goes
+through its endpoint's ``Upstream``:
+
+- each loop backs off exponentially with full jitter, from RECONNECT_BASE_DELAY
+  doubling up to RECONNECT_MAX_DELAY, so connections dropped by the same outage
+  don't reconnect in lockstep;
+- after BREAKER_THRESHOLD consecutive failed connection attempts the endpoint's
+  circuit breaker opens and every loop waits BREAKER_COOLDOWN seconds, then a
+  single probe is let through and its result closes or re-opens the breaker;
+- users are told once when the breaker opens and once when the endpoint
+  recovers, at most once per UPSTREAM_NOTICE_INTERVAL per endpoint, instead of
+  on every dropped connection;
+- every connection sends WebSocket pings (WS_PING_INTERVAL, WS_PING_TIMEOUT), so
+  a half-open TCP connection fails within seconds instead of hanging in recv();
+- a feed that is normally busy (the pump.fun firehose) is also watched for
+  silence: each loop learns its feed's usual gap between frames, and a
+  connection that stays silent for STALE_FACTOR times that gap (at least
+  STALE_MIN_SILENCE seconds) is closed and reconnected. Feeds whose usual gap
+  exceeds STALE_BUSY_GAP, and upstreams created with ``watch_silence=False``
+  (Vybe connections, whose filtered wallets legitimately go quiet), rely on
+  the pings alone.
+
+``health()`` (served at ``/health`` on the metrics server) summarizes each endpoint.
+"""
+
+import asyncio
+import os
+import random
+import time
+import websockets
+
+from logs import SAMPLED, get_logger
+from metrics import CallbackMetric, metrics_server
+from send_queue import send_queue
+
+RECONNECT_BASE_DELAY = float(os.getenv('RECONNECT_BASE_DELAY', '1'))
+RECONNECT_MAX_DELAY = float(os.getenv('RECONNECT_MAX_DELAY', '60'))
+# A session that lasted this long resets its loop's backoff
+RECONNECT_STABLE_AFTER = float(os.getenv('RECONNECT_STABLE_AFTER', '30'))
+BREAKER_THRESHOLD = int(os.getenv('BREAKER_THRESHOLD', '5'))
+BREAKER_COOLDOWN = float(os.getenv('BREAKER_COOLDOWN', '30'))
+UPSTREAM_NOTICE_INTERVAL = float(os.getenv('UPSTREAM_NOTICE_INTERVAL', '600'))
+WS_PING_INTERVAL = float(os.getenv('WS_PING_INTERVAL', '10'))
+WS_PING_TIMEOUT = float(os.getenv('WS_PING_TIMEOUT', '10'))
+# How long closing a dead connection may wait for the close handshake
+WS_CLOSE_TIMEOUT = float(os.getenv('WS_CLOSE_TIMEOUT', '5'))
+# A connection is stale after STALE_FACTOR times its usual gap between frames...
+STALE_FACTOR = float(os.getenv('STALE_FACTOR', '10'))
+# ...but never sooner than this many seconds
+STALE_MIN_SILENCE = float(os.getenv('STALE_MIN_SILENCE', '3'))
+# Feeds whose usual gap is longer than this aren't busy enough to watch for silence
+STALE_BUSY_GAP = float(os.getenv('STALE_BUSY_GAP', '10'))
+# Frames a loop must see before it trusts its learned gap
+STALE_WARMUP_FRAMES = int(os.getenv('STALE_WARMUP_FRAMES', '50'))
+STALE_CHECK_INTERVAL = 1.0
+# Weight of each new gap in the moving average
+GAP_SMOOTHING = 0.05
+
+# Keyword arguments for websockets.connect() shared by every upstream connection
+CONNECT_OPTIONS = {
+    'ping_interval': WS_PING_INTERVAL,
+    'ping_timeout': WS_PING_TIMEOUT,
+    'close_timeout': WS_CLOSE_TIMEOUT,
+}
+
+# Close code sent when a silent connection is dropped (application range)
+STALE_CLOSE_CODE = 4000
+
+# Circuit breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+logger = get_logger('upstreams')
+
+# Map of upstream name → Upstream, in creation order
+registry = {}
+
+class Backoff:
+    """
+    Exponential backoff with full jitter for one reconnecting loop.
+    """
+
+    def __init__(self, base: float = RECONNECT_BASE_DELAY, cap: float = RECONNECT_MAX_DELAY):
+        self.base = base
+        self.cap = cap
+        self.attempts = 0
+
+    def delay(self) -> float:
+        delay = random.uniform(0, min(self.cap, self.base * 2 ** self.attempts))
+        self.attempts += 1
+        return delay
+
+    def reset(self):
+        self.attempts = 0
+
+class Upstream:
+    """
+    Circuit breaker, counters and user notices for one upstream endpoint,
+    shared by every connection to it.
+    """
+
+    def __init__(self, name: str, label: str, recipients=None,
+                 threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN,
+                 notice_interval: float = UPSTREAM_NOTICE_INTERVAL, watch_silence: bool = True):
+        self.name = name
+        # Name shown to users in notices
+        self.label = label
+        # Callable returning the user_ids to notify about outages (None = nobody)
+        self.recipients = recipients
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.notice_interval = notice_interval
+        # False for feeds that can go quiet while healthy; their connections rely on pings alone
+        self.watch_silence = watch_silence
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_started = None
+        self.connections = 0
+        self.failures = 0
+        self.disconnects = 0
+        self.last_error = None
+        self.last_connected = None
+        self.last_notice = 0.0
+        # Map of reason ('silent', 'heartbeat') → connections dropped as stale
+        self.stale = {'silent': 0, 'heartbeat': 0}
+        self.last_stale = None
+        # True once users were told about an outage, so they also hear about the recovery
+        self.outage_notified = False
+        registry[name] = self
+
+    def link(self) -> 'Link':
+        return Link(self)
+
+    async def wait_until_allowed(self):
+        """
+        Return once the breaker lets a connection attempt through.
+        """
+        while True:
+            now = time.monotonic()
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and now - self.opened_at >= self.cooldown:
+                # Let exactly one probe through
+                self.state = HALF_OPEN
+                self.probe_started = now
+                return
+            if self.state == HALF_OPEN and now - self.probe_started >= self.cooldown:
+                # The previous probe never reported back (its loop exited); try another
+                self.probe_started = now
+                return
+            remaining = max(self.opened_at + self.cooldown - now, 1.0)
+            await asyncio.sleep(remaining + random.uniform(0, remaining / 4))
+
+    def record_connected(self):
+        self.connections += 1
+        self.consecutive_failures = 0
+        self.last_connected = time.time()
+        if self.state != CLOSED:
+            logger.info("Upstream %s recovered, closing circuit breaker", self.name)
+            self.state = CLOSED
+        if self.outage_notified:
+            self.outage_notified = False
+            # Always paired with the outage notice, so not rate limited itself
+            self.notify(f"✅ {self.label} connection restored. Alerts are flowing again.", limited=False)
+
+    def record_failure(self, error):
+        """
+        A connection attempt failed before the connection was established.
+        """
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = repr(error)
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= self.threshold):
+            self.open()
+
+    def record_disconnected(self, error):
+        self.connections -= 1
+        self.disconnects += 1
+        if error is not None:
+            self.last_error = repr(error)
+
+    def record_stale(self, reason: str):
+        self.stale[reason] += 1
+        self.last_stale = time.time()
+
+    def open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        logger.warning("Upstream %s unavailable after %d consecutive failures (last: %s), pausing reconnects for %ss",
+                       self.name, self.consecutive_failures, self.last_error, self.cooldown)
+        if not self.outage_notified and self.notify(
+                f"⚠️ {self.label} is currently unreachable. Monitoring continues and alerts will resume automatically once it is back."):
+            self.outage_notified = True
+
+    def notify(self, text: str, limited: bool = True) -> bool:
+        """
+        Send ``text`` to every recipient unless (when ``limited``) a notice went
+        out within the notice interval.
+        """
+        now = time.monotonic()
+        if self.recipients is None:
+            return False
+        if limited and self.last_notice and now - self.last_notice < self.notice_interval:
+            return False
+        self.last_notice = now
+        for user_id in list(self.recipients()):
+            send_queue.send_message(user_id, text=text)
+        return True
+
+    def status(self) -> str:
+        if self.state != CLOSED:
+            return 'down'
+        return 'up' if self.connections else 'idle'
+
+    def health(self) -> dict:
+        return {
+            'status': self.status(),
+            'breaker': self.state,
+            'connections': self.connections,
+            'consecutive_failures': self.consecutive_failures,
+            'failures': self.failures,
+            'disconnects': self.disconnects,
+            'last_error': self.last_error,
+            'last_connected': self.last_connected,
+            'stale': dict(self.stale),
+            'last_stale': self.last_stale,
+        }
+
+class Link:
+    """
+    One reconnecting loop's handle on its upstream: its own backoff and silence
+    watchdog plus the shared breaker.
+
+    Call ``connected(websocket)`` once the connection is established,
+    ``frame()`` for every frame received, ``closed(error)`` whenever the
+    attempt or session ends, and ``await wait()`` before reconnecting.
+    """
+
+    def __init__(self, upstream: Upstream):
+        self.upstream = upstream
+        self.backoff = Backoff()
+        self.connected_at = None
+        self.watchdog = None
+        # True once the watchdog dropped the current connection for silence
+        self.went_silent = False
+        self.last_frame = 0.0
+        # Moving average of the seconds between frames; kept across reconnects
+        self.mean_gap = None
+        self.frames = 0
+
+    def connected(self, websocket=None):
+        self.connected_at = self.last_frame = time.monotonic()
+        self.went_silent = False
+        self.upstream.record_connected()
+        if websocket is not None and self.upstream.watch_silence:
+            self.watchdog = asyncio.create_task(self.watch(websocket))
+
+    def frame(self):
+        now = time.monotonic()
+        gap = now - self.last_frame
+        self.last_frame = now
+        self.frames += 1
+        if self.mean_gap is None:
+            self.mean_gap = gap
+        else:
+            self.mean_gap += GAP_SMOOTHING * (gap - self.mean_gap)
+
+    def silence_limit(self):
+        """
+        Seconds of silence after which the connection counts as stale, or None
+        while the feed isn't known to be busy.
+        """
+        if self.frames < STALE_WARMUP_FRAMES or self.mean_gap > STALE_BUSY_GAP:
+            return None
+        return max(STALE_MIN_SILENCE, STALE_FACTOR * self.mean_gap)
+
+    async def watch(self, websocket):
+        while True:
+            await asyncio.sleep(STALE_CHECK_INTERVAL)
+            limit = self.silence_limit()
+            silence = time.monotonic() - self.last_frame
+            if limit is not None and silence > limit:
+                break
+        logger.warning("%s connection silent for %.0fs (usual gap %.1fs), reconnecting",
+                       self.upstream.name, silence, self.mean_gap)
+        self.went_silent = True
+        self.upstream.record_stale('silent')
+        # Count the silence as a gap so a feed that really slowed down raises its own limit
+        self.mean_gap += GAP_SMOOTHING * (silence - self.mean_gap)
+        await websocket.close(STALE_CLOSE_CODE, "stale stream")
+
+    def closed(self, error=None):
+        if self.watchdog is not None:
+            self.watchdog.cancel()
+            self.watchdog = None
+        # A loop stopped on purpose (no subscribers left, shutdown) didn't fail
+        cancelled = isinstance(error, asyncio.CancelledError)
+        if cancelled:
+            error = None
+        if self.connected_at is None:
+            if not cancelled:
+                self.upstream.record_failure(error or "closed before connecting")
+            return
+        # A connection the watchdog is already closing may also miss a ping; count it once
+        if not self.went_silent and isinstance(error, websockets.exceptions.ConnectionClosed) and error.sent and \
+                error.sent.reason == "keepalive ping timeout":
+            logger.warning("%s connection missed its heartbeat, reconnecting", self.upstream.name)
+            self.upstream.record_stale('heartbeat')
+        if time.monotonic() - self.connected_at >= RECONNECT_STABLE_AFTER:
+            self.backoff.reset()
+        self.connected_at = None
+        self.upstream.record_disconnected(error)
+
+    async def wait(self):
+        delay = self.backoff.delay()
+        logger.info("Reconnecting to %s in %.1fs (attempt %d)", self.upstream.name, delay, self.backoff.attempts, extra=SAMPLED)
+        await asyncio.sleep(delay)
+        await self.upstream.wait_until_allowed()
+
+def health() -> dict:
+    return {name: upstream.health() for name, upstream in registry.items()}
+
+metrics_server.add_view('/health', health)
+
+CallbackMetric('mypal_upstream_up', "1 while the upstream has a live connection and a closed circuit breaker", 'gauge',
+               lambda: {(name,): int(upstream.status() == 'up') for name, upstream in registry.items()}, ('upstream',))
+CallbackMetric('mypal_upstream_breaker_open', "1 while the upstream's circuit breaker is open or half-open", 'gauge',
+               lambda: {(name,): int(upstream.state != CLOSED) for name, upstream in registry.items()}, ('upstream',))
+CallbackMetric('mypal_upstream_connections', "Live connections per upstream", 'gauge',
+               lambda: {(name,): upstream.connections for name, upstream in registry.items()}, ('upstream',))
+CallbackMetric('mypal_upstream_failures_total', "Failed connection attempts per upstream", 'counter',
+               lambda: {(name,): upstream.failures for name, upstream in registry.items()}, ('upstream',))
+CallbackMetric('mypal_upstream_disconnects_total', "Established connections that were closed, per upstream", 'counter',
+               lambda: {(name,): upstream.disconnects for name, upstream in registry.items()}, ('upstream',))
+CallbackMetric('mypal_upstream_stale_total', "Connections dropped for silence or a missed heartbeat, per upstream", 'counter',
+               lambda: {(name, reason): count for name, upstream in registry.items() for reason, count in upstream.stale.items()},
+               ('upstream', 'reason'))
@@ -0,0 +1,306 @@
+"""
+Shared Vybe Network WebSocket connections multiplexed across all users.
+
+Instead of one connection per user and per watchlist entry, every Vybe
+subscription registers a trade filter with the process-wide ``vybe_hub``.
+The hub packs the combined filter set into a small pool of connections and
+routes each incoming trade to the user_ids subscribed to the matching filter.
+"""
+
+import asyncio
+import json
+import os
+import websockets
+
+from dedup import trade_deduper
+from digest import digest_buffer
+from logs import SAMPLED, get_logger
+from metrics import ALERTS_ROUTED, ALERT_LATENCY, CallbackMetric, observe_ack
+from prefilter import AddressPrefilter
+from render import TradeAlert
+from send_queue import send_queue
+from state import snapshot
+from upstreams import CONNECT_OPTIONS, Upstream
+from websocket_handlers import on_message, on_error, on_close, on_open
+
+# Maximum number of trade filters carried by a single Vybe connection
+MAX_FILTERS_PER_CONNECTION = int(os.getenv('VYBE_MAX_FILTERS_PER_CONNECTION', '250'))
+
+VYBE_LATENCY = ALERT_LATENCY.labels('vybe')
+
+logger = get_logger('vybe')
+
+class VybeConnection:
+    """
+    One asyncio Vybe WebSocket connection carrying a subset of the hub's trade filters.
+    """
+
+    def __init__(self, hub, conn_id: int):
+        self.hub = hub
+        self.conn_id = conn_id
+        # Filter keys carried by this connection: (fee_payer, token_mint or None)
+        self.keys = set()
+        self.websocket = None
+        self.task = None
+        self.configure_pending = False
+        # Pending coalesced configure, cancelled when the session ends
+        self.flush_task = None
+
+    def filters(self) -> list:
+        trades = []
+        for fee_payer, token_mint in self.keys:
+            trade_filter = {"feePayer": fee_payer}
+            if token_mint:
+                trade_filter["tokenMintAddress"] = token_mint
+            trades.append(trade_filter)
+        return trades
+
+    def request_configure(self):
+        """
+        Schedule a configure message carrying the current filter set over the live connection.
+        Requests made in the same event loop iteration are coalesced into a single frame.
+        """
+        if self.websocket is None or self.configure_pending:
+            return
+        self.configure_pending = True
+        self.flush_task = asyncio.create_task(self._flush_configure())
+
+    async def _flush_configure(self):
+        await asyncio.sleep(0) # Let the rest of the current burst of changes land first
+        self.configure_pending = False
+        await self.send_configure()
+
+    def _cancel_flush(self):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        # The next session sends the full filter set when it connects
+        self.configure_pending = False
+
+    async def send_configure(self):
+        websocket = self.websocket
+        if websocket is None or not self.keys:
+            return
+        config_message = {
+            "type": "configure",
+            "filters": {
+                "trades": self.filters()
+            }
+        }
+        try:
+            await websocket.send(json.dumps(config_message))
+            logger.debug("Vybe connection %s configured with %d filters", self.conn_id, len(self.keys))
+        except Exception as e:
+            logger.warning("Error sending config message on Vybe connection %s: %s", self.conn_id, e)
+
+    def close(self):
+        """
+        Stop the connection's task, whether it is connecting, connected or backing off.
+        """
+        if self.task is not None:
+            self.task.cancel()
+
+    async def run(self):
+        """
+        Keep the connection alive while it carries at least one filter.
+        """
+        api_key = os.getenv('API_KEY')
+        websocket_uri = os.getenv('WS_URL', "wss://api.vybenetwork.xyz/live")
+
+        link = VYBE_UPSTREAM.link()
+        while self.keys:
+            error = None
+            try:
+                async with websockets.connect(websocket_uri, additional_headers={"X-API-Key": api_key}, **CONNECT_OPTIONS) as websocket:
+                    self.websocket = websocket
+                    link.connected(websocket)
+                    on_open(self)
+                    # The last filter may have gone while connecting; Vybe sends nothing without filters
+                    if not self.keys:
+                        break
+                    await self.send_configure()
+                    if not self.keys:
+                        break
+
+                    async for message in websocket:
+                        link.frame()
+                        on_message(self, message)
+                        if not self.keys:
+                            break
+
+                    logger.info("Vybe connection %s has no filters left or was closed", self.conn_id)
+
+            except asyncio.CancelledError as e:
+                error = e
+                raise
+            except websockets.exceptions.ConnectionClosed as e:
+                on_close(self, e)
+                error = e
+            except Exception as e:
+                on_error(self, e)
+                error = e
+            finally:
+                self.websocket = None
+                self._cancel_flush()
+                link.closed(error)
+
+            if self.keys:
+                # Jittered backoff, and no attempts at all while the breaker is open
+                await link.wait()
+
+        logger.info("Vybe connection %s exited", self.conn_id)
+
+class VybeHub:
+    """
+    Owns the pool of Vybe connections and the filter → user_id routing table.
+    """
+
+    def __init__(self, connect: bool = True):
+        # When False no upstream connections are opened and frames are fed in with on_message (replay)
+        self.connect = connect
+        self.connections = []
+        self.next_conn_id = 1
+        # Map of (fee_payer, token_mint or None) → {user_id: reference count}
+        self.subscribers = {}
+        # Map of filter key → VybeConnection carrying it
+        self.key_connections = {}
+        # Map of fee payer → number of filter keys on it; the prefilter's watched set
+        self.fee_payers = {}
+        self.prefilter = AddressPrefilter('feePayer', self.fee_payers)
+        # Every connection task, including ones still winding down after losing their last filter
+        self.tasks = set()
+
+    def subscribe(self, key: tuple, user_id: int):
+        """
+        Route trades matching ``key`` to ``user_id``. ``key`` is
+        ``(fee_payer, token_mint)`` where ``token_mint`` may be None to get all
+        of the fee payer's trades.
+        """
+        if key not in self.subscribers:
+            self.fee_payers[key[0]] = self.fee_payers.get(key[0], 0) + 1
+        users = self.subscribers.setdefault(key, {})
+        users[user_id] = users.get(user_id, 0) + 1
+
+        if key not in self.key_connections:
+            conn = self._connection_with_capacity()
+            conn.keys.add(key)
+            self.key_connections[key] = conn
+            if self.connect and (conn.task is None or conn.task.done()):
+                conn.task = asyncio.create_task(conn.run())
+                self.tasks.add(conn.task)
+                conn.task.add_done_callback(self.tasks.discard)
+            else:
+                conn.request_configure()
+
+    def unsubscribe(self, key: tuple, user_id: int):
+        users = self.subscribers.get(key)
+        if not users or user_id not in users:
+            return
+
+        users[user_id] -= 1
+        if users[user_id] <= 0:
+            del users[user_id]
+        if users:
+            return
+
+        # Nobody needs this filter anymore
+        del self.subscribers[key]
+        self.fee_payers[key[0]] -= 1
+        if not self.fee_payers[key[0]]:
+            del self.fee_payers[key[0]]
+        conn = self.key_connections.pop(key, None)
+        if conn:
+            conn.keys.discard(key)
+            if conn.keys:
+                conn.request_configure()
+            else:
+                conn.close()
+                self.connections.remove(conn)
+
+    async def close(self):
+        """
+        Stop every connection task, e.g. at shutdown.
+        """
+        tasks = list(self.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _connection_with_capacity(self) -> VybeConnection:
+        for conn in self.connections:
+            if len(conn.keys) < MAX_FILTERS_PER_CONNECTION:
+                return conn
+        conn = VybeConnection(self, self.next_conn_id)
+        self.next_conn_id += 1
+        self.connections.append(conn)
+        return conn
+
+    def dispatch(self, trade_data: dict, connection: VybeConnection):
+        """
+        Deliver a decoded trade to every user subscribed to a matching filter
+        carried by ``connection`` (runs on the event loop). Returns the number
+        of users it was routed to.
+
+        A trade that fails to route for one user is logged and skipped for that user only.
+        """
+        alert = TradeAlert(trade_data)
+        fee_payer = trade_data.get('feePayer', '')
+        signature = trade_data.get('signature')
+        block_time = trade_data.get('blockTime')
+        routed = 0
+        # Most specific first: a trader-token pair decides the route over the trader's all-trades entry
+        candidate_keys = []
+        mints = [mint for mint in (trade_data.get('baseMintAddress'), trade_data.get('quoteMintAddress')) if mint]
+        for key in [(fee_payer, mint) for mint in mints] + [(fee_payer, None)]:
+            if key not in candidate_keys and key in self.subscribers:
+                candidate_keys.append(key)
+
+        # Users reachable through a filter on this connection
+        reached = set()
+        for key in candidate_keys:
+            if self.key_connections.get(key) is connection:
+                reached.update(self.subscribers[key])
+
+        # Pick one route per user from all their matching entries (on any connection), and record
+        # the signature once it is routed so the trade's copy on their other filters is skipped
+        rendered = {}
+        for user_id in reached:
+            if trade_deduper.is_duplicate(user_id, signature):
+                continue
+            key = next(key for key in candidate_keys if user_id in self.subscribers[key])
+            try:
+                snap = snapshot(user_id)
+                if snap.wants_digest(key):
+                    digest_buffer.add(user_id, key, trade_data, snap.digest_window)
+                    ALERTS_ROUTED.labels('digest').inc()
+                else:
+                    # Each alert variant is rendered once and shared by all its recipients
+                    token_mint = key[1]
+                    if token_mint not in rendered:
+                        rendered[token_mint] = alert.render(token_mint)
+                    future = send_queue.send_message(user_id, text=rendered[token_mint], parse_mode='HTML')
+                    if block_time:
+                        future.add_done_callback(observe_ack(VYBE_LATENCY, block_time))
+                    ALERTS_ROUTED.labels('token_trade' if token_mint else 'trader_trade').inc()
+            except Exception:
+                # Leave the signature unrecorded so another filter can still deliver it
+                logger.exception("Error routing trade %s to user %s", signature, user_id, extra=SAMPLED)
+                continue
+            trade_deduper.record(user_id, signature)
+            routed += 1
+
+        return routed
+
+# Process-wide hub shared by every Vybe subscription
+vybe_hub = VybeHub()
+
+# Reconnect policy and health shared by every connection in the pool
+VYBE_UPSTREAM = Upstream('vybe', "Vybe Network",
+                         recipients=lambda: {user_id for users in vybe_hub.subscribers.values() for user_id in users},
+                         # Filtered connections go quiet whenever their wallets do, so only the pings detect dead ones
+                         watch_silence=False)
+
+CallbackMetric('mypal_vybe_connections', "Vybe connections currently open", 'gauge',
+               lambda: sum(1 for conn in vybe_hub.connections if conn.websocket is not None))
+CallbackMetric('mypal_vybe_filters', "Trade filters registered across all Vybe connections", 'gauge',
+               lambda: len(vybe_hub.key_connections))
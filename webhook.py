@@ -0,0 +1,141 @@
+"""
+Webhook ingestion mode: Telegram pushes updates to an in-process aiohttp server.
+
+Enabled by setting TELEGRAM_WEBHOOK_URL to the public HTTPS URL Telegram should
+call (usually a reverse proxy in front of WEBHOOK_LISTEN:WEBHOOK_PORT). Unlike
+run_polling there is no getUpdates long-poll round trip. Only one bot process
+may serve the webhook: watchlists, pending buttons and the SQLite store are
+local to the process (use SHARD_WORKERS to spread monitoring over cores).
+"""
+
+import asyncio
+import hmac
+import os
+import secrets
+import signal
+from aiohttp import web
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import Application
+
+from logs import SAMPLED, get_logger
+
+# Public URL Telegram posts updates to; webhook mode is off when unset
+WEBHOOK_URL = os.getenv('TELEGRAM_WEBHOOK_URL')
+# Local path the server answers on (the proxy may rewrite to it)
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT') or os.getenv('PORT') or '8080')
+# Telegram echoes it in X-Telegram-Bot-Api-Secret-Token; set it so it survives restarts
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN')
+# Simultaneous HTTPS connections Telegram may open to the webhook (1-100)
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+# Discard updates that queued up while the bot was down
+WEBHOOK_DROP_PENDING = os.getenv('WEBHOOK_DROP_PENDING', '').lower() in ('1', 'true', 'yes')
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+logger = get_logger('webhook')
+
+class WebhookServer:
+    """
+    Receives webhook POSTs, verifies the secret token and feeds updates into the application's update queue.
+    """
+
+    def __init__(self, application: Application, url: str = WEBHOOK_URL, path: str = WEBHOOK_PATH,
+                 listen: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT, secret_token: str = WEBHOOK_SECRET_TOKEN,
+                 max_connections: int = WEBHOOK_MAX_CONNECTIONS):
+        self.application = application
+        self.url = url
+        self.path = path
+        self.listen = listen
+        self.port = port
+        if not secret_token:
+            secret_token = secrets.token_urlsafe(32)
+            logger.warning("WEBHOOK_SECRET_TOKEN is not set; using a random one for this run")
+        self.secret_token = secret_token
+        self.max_connections = max_connections
+        self.runner = None
+        self.received = 0
+        self.rejected = 0
+        self.malformed = 0
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, '')
+        if not hmac.compare_digest(token.encode(), self.secret_token.encode()):
+            self.rejected += 1
+            return web.Response(status=403)
+        try:
+            data = await request.json()
+            if not isinstance(data, dict):
+                raise ValueError("update is not a JSON object")
+            update = Update.de_json(data, self.application.bot)
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            self.malformed += 1
+            logger.warning("Malformed webhook update: %s", e, extra=SAMPLED)
+            return web.Response(status=400)
+        self.received += 1
+        # Answer Telegram right away; handlers run from the update queue
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({'ok': True, 'received': self.received, 'rejected': self.rejected, 'malformed': self.malformed,
+                                  'pending': self.application.update_queue.qsize()})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        app.router.add_get('/healthz', self.handle_health)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.listen, self.port).start()
+        logger.info("Webhook server listening on %s:%s%s", self.listen, self.port, self.path)
+
+        await self.application.bot.set_webhook(
+            url=self.url,
+            secret_token=self.secret_token,
+            max_connections=self.max_connections,
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=WEBHOOK_DROP_PENDING
+        )
+        logger.info("Webhook registered at %s", self.url)
+
+    async def stop(self):
+        # Telegram keeps updates for the next start instead of retrying a dead endpoint
+        try:
+            await self.application.bot.delete_webhook()
+        except TelegramError as e:
+            logger.warning("Could not remove the webhook: %s", e)
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+async def run_webhook(application: Application, url: str = WEBHOOK_URL):
+    """
+    Run ``application`` (built with ``.updater(None)``) in webhook mode until SIGINT/SIGTERM.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError: # Windows
+            pass
+
+    async with application:
+        # run_polling calls these hooks itself; the manual lifecycle has to do it here
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        server = WebhookServer(application, url=url)
+        try:
+            await server.start()
+            await stop.wait()
+        finally:
+            await server.stop()
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+    if application.post_shutdown:
+        await application.post_shutdown(application)